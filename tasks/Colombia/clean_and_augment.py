@@ -5,69 +5,130 @@ This script cleans and augments the dataset to improve model accuracy
 """
 
 import os
+import math
+import functools
+import contextlib
 import shutil
+import multiprocessing
 import numpy as np
 from PIL import Image, ImageEnhance, ImageFilter
 import random
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from features_cache import FeatureCache
+from dataset_utils import (FEATURE_SIZE, count_images, image_stats, list_images, load_grayscale,
+                           scan_class_dirs)
+
+try:
+    import torch
+    import torch.nn.functional as F
+except ImportError:  # torch is optional; augmentation falls back to PIL
+    torch = None
 
 # Set random seeds
 random.seed(42)
 np.random.seed(42)
 
-def count_images(base_path):
-    """Count images in each class"""
-    counts = {}
-    for class_name in sorted(os.listdir(base_path)):
-        class_path = os.path.join(base_path, class_name)
-        if os.path.isdir(class_path) and not class_name.startswith('.'):
-            images = [f for f in os.listdir(class_path) if not f.startswith('.')]
-            counts[class_name] = len(images)
-    return counts
+def _kernel_copy(src, dst):
+    """Copy file contents in kernel space with copy_file_range where available"""
+    with contextlib.ExitStack() as stack:
+        # Unbuffered so the fd offsets advanced by the kernel stay authoritative
+        fsrc = stack.enter_context(open(src, 'rb', buffering=0))
+        fdst = stack.enter_context(open(dst, 'wb', buffering=0))
+        remaining = os.fstat(fsrc.fileno()).st_size
+        try:
+            while remaining > 0:
+                copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+        except (AttributeError, OSError):
+            # Not Linux, or unsupported by the filesystem: finish in userspace
+            shutil.copyfileobj(fsrc, fdst)
+    shutil.copymode(src, dst)
+
+def _fast_copy(src, dst):
+    """Hardlink src to dst, falling back to a real copy across filesystems"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        _kernel_copy(src, dst)
+    return dst
+
+COPY_WORKERS = 16
+
+def _copy_all(pairs):
+    """Copy (src, dst) pairs concurrently; copies are syscall-bound and release the GIL"""
+    with ThreadPoolExecutor(max_workers=COPY_WORKERS) as ex:
+        list(ex.map(lambda pair: _fast_copy(*pair), pairs))
 
 def get_image_features(img_path):
     """Extract features from an image for outlier detection"""
-    img = Image.open(img_path).convert('L')
-    img_array = np.array(img)
+    img_array = np.asarray(load_grayscale(img_path, FEATURE_SIZE), dtype=np.uint8)
+    return list(image_stats(img_array.ravel()))
 
-    return [
-        np.mean(img_array),
-        np.std(img_array),
-        np.min(img_array),
-        np.max(img_array),
-    ]
+def _extract_features(task):
+    """Pool worker: compute features for one (class_name, img_path) task"""
+    class_name, img_path = task
+    try:
+        return class_name, img_path, get_image_features(img_path), None
+    except Exception as e:
+        return class_name, img_path, None, e
 
 def find_outliers(base_path):
     """Find potential outliers in each class"""
     outliers_info = {}
 
-    for class_name in sorted(os.listdir(base_path)):
-        class_path = os.path.join(base_path, class_name)
-        if not os.path.isdir(class_path) or class_name.startswith('.'):
-            continue
+    # Build the full task list up front so one pool covers every class
+    class_images = {}
+    tasks = []
+    for class_name, class_path in scan_class_dirs(base_path):
+        images = list_images(class_path)
+        class_images[class_name] = images
+        tasks.extend((class_name, os.path.join(class_path, img_name)) for img_name in images)
+
+    # Preallocate per-class feature arrays and fill them in place
+    class_features = {class_name: np.empty((len(images), 4), dtype=np.float32)
+                      for class_name, images in class_images.items()}
+    class_paths = {class_name: [] for class_name in class_images}
+
+    def add(class_name, img_path, feat):
+        class_features[class_name][len(class_paths[class_name])] = feat
+        class_paths[class_name].append(img_path)
+
+    with FeatureCache() as cache:
+        # Reuse features of unchanged files from earlier runs
+        cached = cache.lookup([img_path for _, img_path in tasks])
+        for class_name, img_path in tasks:
+            if img_path in cached:
+                add(class_name, img_path, cached[img_path])
+
+        computed = []
+        misses = [task for task in tasks if task[1] not in cached]
+        with multiprocessing.Pool(os.cpu_count()) as pool:
+            for class_name, img_path, feat, error in pool.imap_unordered(_extract_features, misses, chunksize=32):
+                if error is not None:
+                    print(f"  Error processing {os.path.basename(img_path)}: {error}")
+                    continue
+                add(class_name, img_path, feat)
+                computed.append((img_path, feat))
+        cache.store(computed)
 
+    for class_name, images in class_images.items():
         print(f"Analyzing class: {class_name}")
-        images = [f for f in os.listdir(class_path) if not f.startswith('.')]
-
-        features = []
-        image_paths = []
-        for img_name in images:
-            img_path = os.path.join(class_path, img_name)
-            try:
-                feat = get_image_features(img_path)
-                features.append(feat)
-                image_paths.append(img_path)
-            except Exception as e:
-                print(f"  Error processing {img_name}: {e}")
-
-        features = np.array(features)
+        image_paths = class_paths[class_name]
+        features = class_features[class_name][:len(image_paths)]
 
         # Find outliers using IQR method
-        Q1 = np.percentile(features, 25, axis=0)
-        Q3 = np.percentile(features, 75, axis=0)
+        Q1, Q3 = np.quantile(features, (0.25, 0.75), axis=0)
         IQR = Q3 - Q1
+        lower = Q1 - 1.5 * IQR
+        upper = Q3 + 1.5 * IQR
 
-        outlier_mask = np.any((features < (Q1 - 1.5 * IQR)) | (features > (Q3 + 1.5 * IQR)), axis=1)
+        out_of_range = np.empty(features.shape, dtype=bool)
+        np.less(features, lower, out=out_of_range)
+        out_of_range |= features > upper
+        outlier_mask = out_of_range.any(axis=1)
         outlier_indices = np.where(outlier_mask)[0]
 
         print(f"  Found {len(outlier_indices)} potential outliers out of {len(images)} images")
@@ -81,42 +142,61 @@ def create_cleaned_dataset(base_path, outliers_dict, output_path, removal_rate=0
 
     removed_count = 0
     kept_count = 0
+    to_copy = []
 
-    for class_name in sorted(os.listdir(base_path)):
-        class_path = os.path.join(base_path, class_name)
-        if not os.path.isdir(class_path) or class_name.startswith('.'):
-            continue
-
+    for class_name, class_path in scan_class_dirs(base_path):
         output_class_path = os.path.join(output_path, class_name)
         os.makedirs(output_class_path, exist_ok=True)
 
-        outlier_set = set(outliers_dict.get(class_name, []))
-
-        for img_name in os.listdir(class_path):
-            if img_name.startswith('.'):
-                continue
-            img_path = os.path.join(class_path, img_name)
+        outlier_names = frozenset(os.path.basename(p) for p in outliers_dict.get(class_name, ()))
 
+        for img_name in list_images(class_path):
             # Remove some outliers
-            if img_path in outlier_set and len(outlier_set) > 0:
+            if img_name in outlier_names:
                 if random.random() < removal_rate:
                     removed_count += 1
                     continue
 
-            shutil.copy(img_path, output_class_path)
+            to_copy.append((os.path.join(class_path, img_name), os.path.join(output_class_path, img_name)))
             kept_count += 1
 
+    _copy_all(to_copy)
+
     print(f"\nCleaning complete:")
     print(f"  Kept: {kept_count} images")
     print(f"  Removed: {removed_count} images")
 
     return output_path
 
+@functools.lru_cache(maxsize=512)
+def _load_source(img_path):
+    """Decode a source image once; augment_image returns new images, so sharing is safe"""
+    with Image.open(img_path) as img:
+        return img.copy()
+
+def _affine_matrix(size, angle=0, shift_x=0, shift_y=0):
+    """Compose a rotation about the centre and a shift into one inverse AFFINE matrix
+
+    The image is rotated counter-clockwise by angle degrees (like Image.rotate)
+    and then shifted, so both steps cost a single resample.
+    """
+    w, h = size
+    cx, cy = w / 2.0, h / 2.0
+    theta = -math.radians(angle)
+    cos, sin = math.cos(theta), math.sin(theta)
+    tx, ty = shift_x - cx, shift_y - cy
+    return (cos, sin, cos * tx + sin * ty + cx,
+            -sin, cos, -sin * tx + cos * ty + cy)
+
+def _affine(img, angle=0, shift_x=0, shift_y=0):
+    """Apply a fused rotate+shift with a single interpolation, filling with white"""
+    matrix = _affine_matrix(img.size, angle, shift_x, shift_y)
+    return img.transform(img.size, Image.AFFINE, matrix, resample=Image.BILINEAR, fillcolor=255)
+
 def augment_image(img, augmentation_type):
     """Apply various augmentation techniques"""
     if augmentation_type == 'rotate_small':
-        angle = random.randint(-15, 15)
-        return img.rotate(angle, fillcolor=255)
+        return _affine(img, angle=random.randint(-15, 15))
 
     elif augmentation_type == 'brightness':
         enhancer = ImageEnhance.Brightness(img)
@@ -132,54 +212,151 @@ def augment_image(img, augmentation_type):
         return img.filter(ImageFilter.GaussianBlur(radius=random.uniform(0.5, 1.5)))
 
     elif augmentation_type == 'shift':
-        shift_x = random.randint(-3, 3)
-        shift_y = random.randint(-3, 3)
-        return img.transform(img.size, Image.AFFINE, (1, 0, shift_x, 0, 1, shift_y), fillcolor=255)
+        return _affine(img, shift_x=random.randint(-3, 3), shift_y=random.randint(-3, 3))
 
     return img
 
+AUGMENT_BATCH_SIZE = 64
+BLUR_KERNEL_SIZE = 11  # covers 3 sigma of the largest blur radius (1.5)
+
+def augment_batch_gpu(imgs, aug_types, device='cuda'):
+    """Apply one augmentation per image to a same-size batch on the GPU
+
+    Mirrors augment_image: rotate/shift share a single affine resample, the
+    photometric ops are per-sample broadcasts and blur is a grouped convolution.
+    """
+    mode = imgs[0].mode
+    arrays = np.stack([np.asarray(img) for img in imgs])
+    if arrays.ndim == 3:
+        arrays = arrays[..., None]
+    x = torch.from_numpy(arrays).to(device).permute(0, 3, 1, 2).float() / 255
+    n, c, h, w = x.shape
+
+    theta = torch.zeros(n, 2, 3)
+    theta[:, 0, 0] = 1
+    theta[:, 1, 1] = 1
+    brightness = torch.ones(n)
+    contrast = torch.ones(n)
+    sigma = torch.zeros(n)
+    for i, aug_type in enumerate(aug_types):
+        if aug_type == 'rotate_small':
+            angle = math.radians(random.randint(-15, 15))
+            cos, sin = math.cos(angle), math.sin(angle)
+            theta[i, 0, :2] = torch.tensor([cos, -sin * h / w])
+            theta[i, 1, :2] = torch.tensor([sin * w / h, cos])
+        elif aug_type == 'brightness':
+            brightness[i] = random.uniform(0.7, 1.3)
+        elif aug_type == 'contrast':
+            contrast[i] = random.uniform(0.8, 1.2)
+        elif aug_type == 'blur':
+            sigma[i] = random.uniform(0.5, 1.5)
+        elif aug_type == 'shift':
+            theta[i, 0, 2] = 2 * random.randint(-3, 3) / w
+            theta[i, 1, 2] = 2 * random.randint(-3, 3) / h
+
+    # Affine: sample the inverted image so out-of-bounds pixels fill white
+    grid = F.affine_grid(theta.to(device), x.shape, align_corners=False)
+    x = 1 - F.grid_sample(1 - x, grid, mode='bilinear', padding_mode='zeros', align_corners=False)
+
+    # Brightness scales towards black, contrast towards the mean gray level
+    x = x * brightness.to(device).view(n, 1, 1, 1)
+    gray = x if c == 1 else (x * torch.tensor([0.299, 0.587, 0.114], device=device).view(1, 3, 1, 1)).sum(1, keepdim=True)
+    mean = gray.mean(dim=(1, 2, 3), keepdim=True)
+    x = mean + contrast.to(device).view(n, 1, 1, 1) * (x - mean)
+
+    # Separable Gaussian blur; sigma == 0 gives an identity kernel
+    t = torch.arange(BLUR_KERNEL_SIZE, dtype=torch.float32) - BLUR_KERNEL_SIZE // 2
+    kernel = torch.exp(-t[None] ** 2 / (2 * sigma.clamp(min=1e-6)[:, None] ** 2))
+    kernel = kernel / kernel.sum(1, keepdim=True)
+    kernel = kernel.repeat_interleave(c, dim=0).to(device)
+    pad = BLUR_KERNEL_SIZE // 2
+    x = x.reshape(1, n * c, h, w)
+    x = F.conv2d(F.pad(x, (pad, pad, 0, 0), mode='replicate'), kernel.view(n * c, 1, 1, -1), groups=n * c)
+    x = F.conv2d(F.pad(x, (0, 0, pad, pad), mode='replicate'), kernel.view(n * c, 1, -1, 1), groups=n * c)
+    x = x.reshape(n, c, h, w)
+
+    out = (x.clamp(0, 1) * 255).round().to(torch.uint8).permute(0, 2, 3, 1).cpu().numpy()
+    if c == 1:
+        out = out[..., 0]
+    return [Image.fromarray(arr, mode) for arr in out]
+
+def _augment_one(task):
+    """Pool worker: open, augment and save one planned augmentation"""
+    img_path, out_path, aug_type, seed = task
+    random.seed(seed)
+    augment_image(_load_source(img_path), aug_type).save(out_path)
+
+def augment_class_gpu(class_path, output_class_path, images, needed, augmentation_types):
+    """Batched GPU variant of the augmentation loop in balance_and_augment"""
+    augmented = 0
+    while augmented < needed:
+        batch_size = min(AUGMENT_BATCH_SIZE, needed - augmented)
+
+        # Images can only be stacked with others of the same size and mode
+        groups = defaultdict(list)
+        for index in range(augmented, augmented + batch_size):
+            img_name = random.choice(images)
+            img = _load_source(os.path.join(class_path, img_name))
+            img = img.convert('L' if img.mode == 'L' else 'RGB')
+            aug_type = random.choice(augmentation_types)
+            groups[(img.size, img.mode)].append((index, img_name, aug_type, img))
+
+        for group in groups.values():
+            outputs = augment_batch_gpu([item[3] for item in group], [item[2] for item in group])
+            for (index, img_name, aug_type, _), augmented_img in zip(group, outputs):
+                base_name, ext = os.path.splitext(img_name)
+                aug_name = f"{base_name}_aug{index}_{aug_type}{ext}"
+                augmented_img.save(os.path.join(output_class_path, aug_name))
+
+        augmented += batch_size
+
+    return augmented
+
 def balance_and_augment(cleaned_path, output_path, target_per_class=280):
     """Balance classes and apply augmentation"""
     os.makedirs(output_path, exist_ok=True)
 
     augmentation_types = ['rotate_small', 'brightness', 'contrast', 'blur', 'shift']
 
-    for class_name in sorted(os.listdir(cleaned_path)):
-        class_path = os.path.join(cleaned_path, class_name)
-        if not os.path.isdir(class_path) or class_name.startswith('.'):
-            continue
-
+    for class_name, class_path in scan_class_dirs(cleaned_path):
         output_class_path = os.path.join(output_path, class_name)
         os.makedirs(output_class_path, exist_ok=True)
 
-        images = [f for f in os.listdir(class_path) if not f.startswith('.')]
+        images = list_images(class_path)
         current_count = len(images)
 
         print(f"\nClass {class_name}: {current_count} images -> targeting {target_per_class}")
 
         # Copy original images
-        for img_name in images:
-            shutil.copy(os.path.join(class_path, img_name), output_class_path)
+        _copy_all((os.path.join(class_path, img_name), os.path.join(output_class_path, img_name))
+                  for img_name in images)
 
         # Augment to reach target
         needed = target_per_class - current_count
-        if needed > 0:
-            augmented = 0
-            while augmented < needed:
+        if needed > 0 and torch is not None and torch.cuda.is_available():
+            augmented = augment_class_gpu(class_path, output_class_path, images, needed, augmentation_types)
+            print(f"  Added {augmented} augmented images")
+        elif needed > 0:
+            # Draw the whole plan up front; per-task seeds keep it reproducible in parallel
+            plan = []
+            for augmented in range(needed):
                 img_name = random.choice(images)
-                img_path = os.path.join(class_path, img_name)
-                img = Image.open(img_path)
-
                 aug_type = random.choice(augmentation_types)
-                augmented_img = augment_image(img, aug_type)
 
-                base_name = os.path.splitext(img_name)[0]
-                ext = os.path.splitext(img_name)[1]
+                base_name, ext = os.path.splitext(img_name)
                 aug_name = f"{base_name}_aug{augmented}_{aug_type}{ext}"
-                augmented_img.save(os.path.join(output_class_path, aug_name))
-                augmented += 1
+                plan.append((os.path.join(class_path, img_name), os.path.join(output_class_path, aug_name),
+                             aug_type, random.randint(0, 2**31)))
 
-            print(f"  Added {augmented} augmented images")
+            # A pool per class keeps each worker's source-image cache scoped to the class
+            with multiprocessing.Pool(os.cpu_count()) as pool:
+                for _ in pool.imap_unordered(_augment_one, plan, chunksize=32):
+                    pass
+
+            print(f"  Added {len(plan)} augmented images")
+
+        # Bound memory: source images are only reused within a class
+        _load_source.cache_clear()
 
     return output_path
 
@@ -188,6 +365,9 @@ def main():
     print("Roman Numeral Dataset Cleaning & Augmentation")
     print("="*60)
 
+    # Compile the stats kernel once before the worker pool forks
+    image_stats(np.zeros(1, dtype=np.uint8))
+
     # Step 1: Analyze original dataset
     print("\n[1/6] Analyzing original dataset...")
     train_counts = count_images('dataset/train')
@@ -221,13 +401,13 @@ def main():
 
     # Step 5: Copy validation set
     print("\n[5/6] Copying validation set...")
-    shutil.copytree('dataset/val', 'dataset_augmented/val')
+    shutil.copytree('dataset/val', 'dataset_augmented/val', copy_function=_fast_copy)
 
     # Step 6: Create data_original for training
     print("\n[6/6] Creating data_original directory for training...")
     if os.path.exists('data_original'):
         shutil.rmtree('data_original')
-    shutil.copytree('dataset_augmented', 'data_original')
+    shutil.copytree('dataset_augmented', 'data_original', copy_function=_fast_copy)
 
     # Final statistics
     print("\n" + "="*60)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Dataset walking and image helpers shared by the cleaning, diagnostic and
+inspection scripts
+"""
+
+import io
+import os
+import numpy as np
+from pathlib import Path
+from PIL import Image
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; fall back to plain NumPy reductions
+    njit = None
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def image_stats(a):
+        """Single pass over a flat uint8 buffer returning (mean, std, min, max)"""
+        total = 0.0
+        total_sq = 0.0
+        mn = 255
+        mx = 0
+        for i in range(a.size):
+            v = a[i]
+            fv = float(v)
+            total += fv
+            total_sq += fv * fv
+            if v < mn:
+                mn = v
+            if v > mx:
+                mx = v
+        mean = total / a.size
+        return mean, np.sqrt(max(total_sq / a.size - mean * mean, 0.0)), mn, mx
+else:
+    def image_stats(a):
+        """NumPy fallback returning (mean, std, min, max)"""
+        return a.mean(), a.std(), a.min(), a.max()
+
+def scan_class_dirs(base_path):
+    """Return sorted (name, path) pairs for the visible class directories"""
+    with os.scandir(base_path) as it:
+        entries = [e for e in it if e.is_dir() and not e.name.startswith('.')]
+    return [(e.name, e.path) for e in sorted(entries, key=lambda e: e.name)]
+
+def list_images(class_path):
+    """Return the names of the visible image files in a class directory"""
+    with os.scandir(class_path) as it:
+        return [e.name for e in it if e.is_file() and not e.name.startswith('.')]
+
+def count_images(base_path):
+    """Count images in each class"""
+    counts = {}
+    for class_name, class_path in scan_class_dirs(base_path):
+        counts[class_name] = len(list_images(class_path))
+    return counts
+
+FEATURE_SIZE = (64, 64)  # brightness statistics barely change on a thumbnail
+# Bump when the statistics computed from the thumbnail change, so cached features are recomputed
+FEATURE_VERSION = 1
+
+def load_grayscale(img_path, size=None):
+    """Decode an image to grayscale from a single whole-file read
+
+    If size is given the image is downscaled to fit it, letting JPEG decoders
+    skip work via draft mode.
+    """
+    with io.BytesIO(Path(img_path).read_bytes()) as buf:
+        img = Image.open(buf)
+        if size is not None:
+            img.draft('L', size)
+        img = img.convert('L')
+    if size is not None:
+        img.thumbnail(size, Image.BILINEAR)
+    return img
@@ -4,10 +4,89 @@ Diagnostic script to identify data quality issues
 """
 
 import os
+import multiprocessing
 import numpy as np
-from PIL import Image
 import random
-from collections import defaultdict
+from collections import Counter, defaultdict
+from features_cache import FeatureCache
+from dataset_utils import FEATURE_SIZE, image_stats, list_images, load_grayscale, scan_class_dirs
+
+def get_image_features(img_path):
+    """Extract mean/std/min/max brightness features from an image"""
+    img_array = np.asarray(load_grayscale(img_path, FEATURE_SIZE), dtype=np.uint8)
+    return list(image_stats(img_array.ravel()))
+
+def _extract_features(task):
+    """Pool worker: compute features for one (class_name, img_path) task"""
+    class_name, img_path = task
+    try:
+        return class_name, img_path, get_image_features(img_path)
+    except:
+        return class_name, img_path, None
+
+def _load_thumbnail(task):
+    """Pool worker: decode the feature thumbnail for one (class_name, img_path) task"""
+    class_name, img_path = task
+    try:
+        return class_name, img_path, np.asarray(load_grayscale(img_path, FEATURE_SIZE), dtype=np.uint8)
+    except:
+        return class_name, img_path, None
+
+def stacked_image_features(thumbnails):
+    """Reduce a list of same-size thumbnails to an (N, 4) mean/std/min/max array"""
+    flat = np.stack(thumbnails).reshape(len(thumbnails), -1)
+    return np.column_stack([flat.mean(1), flat.std(1), flat.min(1), flat.max(1)])
+
+N_FEATURES = 4
+
+def _extract_all(tasks, stacked=False):
+    """Run feature extraction for all tasks in a process pool, grouped by class
+
+    Returns {class_name: (paths, features)} where features is an (N, 4)
+    float32 array filled in place. With stacked=True the workers only decode
+    thumbnails and the statistics are computed for each group of same-size
+    thumbnails in one reduction.
+    """
+    counts = Counter(class_name for class_name, _ in tasks)
+    features = {key: np.empty((n, N_FEATURES), dtype=np.float32) for key, n in counts.items()}
+    paths = {key: [] for key in counts}
+
+    def add(class_name, img_path, feat):
+        features[class_name][len(paths[class_name])] = feat
+        paths[class_name].append(img_path)
+
+    with FeatureCache() as cache:
+        # Reuse features of unchanged files from earlier runs
+        cached = cache.lookup([img_path for _, img_path in tasks])
+        for class_name, img_path in tasks:
+            if img_path in cached:
+                add(class_name, img_path, cached[img_path])
+
+        computed = []
+        misses = [task for task in tasks if task[1] not in cached]
+        with multiprocessing.Pool(os.cpu_count()) as pool:
+            if stacked:
+                by_shape = defaultdict(list)
+                for class_name, img_path, thumb in pool.imap_unordered(_load_thumbnail, misses, chunksize=32):
+                    if thumb is not None:
+                        by_shape[thumb.shape].append((class_name, img_path, thumb))
+                for group in by_shape.values():
+                    group_features = stacked_image_features([thumb for _, _, thumb in group])
+                    for (class_name, img_path, _), feat in zip(group, group_features):
+                        add(class_name, img_path, feat)
+                        computed.append((img_path, feat))
+            else:
+                for class_name, img_path, feat in pool.imap_unordered(_extract_features, misses, chunksize=32):
+                    if feat is not None:
+                        add(class_name, img_path, feat)
+                        computed.append((img_path, feat))
+        cache.store(computed)
+
+    # Drop the unfilled rows left by unreadable images
+    results = defaultdict(lambda: ([], np.empty((0, N_FEATURES), dtype=np.float32)))
+    for key in counts:
+        results[key] = (paths[key], features[key][:len(paths[key])])
+    return results
 
 def analyze_class_similarity(base_path):
     """Check if images within each class are consistent"""
@@ -15,30 +94,20 @@ def analyze_class_similarity(base_path):
     print("CLASS CONSISTENCY ANALYSIS")
     print("="*60)
 
-    for class_name in sorted(os.listdir(base_path)):
-        class_path = os.path.join(base_path, class_name)
-        if not os.path.isdir(class_path) or class_name.startswith('.'):
-            continue
-
-        images = [f for f in os.listdir(class_path) if not f.startswith('.')]
+    class_images = {}
+    tasks = []
+    for class_name, class_path in scan_class_dirs(base_path):
+        images = list_images(class_path)
+        class_images[class_name] = images
 
         # Sample features
-        features = []
         for img_name in random.sample(images, min(50, len(images))):
-            img_path = os.path.join(class_path, img_name)
-            try:
-                img = Image.open(img_path).convert('L')
-                img_array = np.array(img)
-                features.append([
-                    np.mean(img_array),
-                    np.std(img_array),
-                    np.min(img_array),
-                    np.max(img_array)
-                ])
-            except:
-                pass
-
-        features = np.array(features)
+            tasks.append((class_name, os.path.join(class_path, img_name)))
+
+    results = _extract_all(tasks, stacked=True)
+
+    for class_name, images in class_images.items():
+        _, features = results[class_name]
         mean_features = np.mean(features, axis=0)
         std_features = np.std(features, axis=0)
 
@@ -63,40 +132,38 @@ def compare_train_val_distribution(train_path, val_path):
     print("TRAIN vs VAL DISTRIBUTION COMPARISON")
     print("="*60)
 
-    classes = sorted([d for d in os.listdir(train_path) if os.path.isdir(os.path.join(train_path, d)) and not d.startswith('.')])
+    classes = [class_name for class_name, _ in scan_class_dirs(train_path)]
 
-    for class_name in classes:
+    # One flat task list over both splits; the pool key is (class index, split)
+    tasks = []
+    for cls_idx, class_name in enumerate(classes):
         train_class = os.path.join(train_path, class_name)
         val_class = os.path.join(val_path, class_name)
 
         # Sample from train
-        train_images = [f for f in os.listdir(train_class) if not f.startswith('.')]
-        train_features = []
+        train_images = list_images(train_class)
         for img_name in random.sample(train_images, min(30, len(train_images))):
-            img_path = os.path.join(train_class, img_name)
-            try:
-                img = Image.open(img_path).convert('L')
-                img_array = np.array(img)
-                train_features.append(np.mean(img_array))
-            except:
-                pass
+            tasks.append(((cls_idx, 0), os.path.join(train_class, img_name)))
 
         # Sample from val
-        val_images = [f for f in os.listdir(val_class) if not f.startswith('.')]
-        val_features = []
-        for img_name in val_images[:30]:
-            img_path = os.path.join(val_class, img_name)
-            try:
-                img = Image.open(img_path).convert('L')
-                img_array = np.array(img)
-                val_features.append(np.mean(img_array))
-            except:
-                pass
-
-        train_mean = np.mean(train_features)
-        val_mean = np.mean(val_features)
-        diff = abs(train_mean - val_mean)
-
+        for img_name in list_images(val_class)[:30]:
+            tasks.append(((cls_idx, 1), os.path.join(val_class, img_name)))
+
+    results = _extract_all(tasks)
+
+    # Per-(class, split) mean brightness in one bincount; the empty leading
+    # arrays keep a run with no readable images printing NaN stats
+    group = np.concatenate([np.empty(0, dtype=np.intp)] +
+                           [np.full(len(feats), cls_idx * 2 + split, dtype=np.intp)
+                            for (cls_idx, split), (_, feats) in results.items()])
+    brightness = np.concatenate([np.empty(0)] + [feats[:, 0] for _, feats in results.values()])
+    sums = np.bincount(group, weights=brightness, minlength=2 * len(classes))
+    counts = np.bincount(group, minlength=2 * len(classes))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = (sums / counts).reshape(len(classes), 2)
+    diffs = np.abs(means[:, 0] - means[:, 1])
+
+    for class_name, (train_mean, val_mean), diff in zip(classes, means, diffs):
         print(f"\nClass {class_name}:")
         print(f"  Train mean brightness: {train_mean:.2f}")
         print(f"  Val mean brightness: {val_mean:.2f}")
@@ -113,37 +180,30 @@ def find_extreme_outliers(base_path, output_dir='extreme_outliers'):
 
     os.makedirs(output_dir, exist_ok=True)
 
-    for class_name in sorted(os.listdir(base_path)):
-        class_path = os.path.join(base_path, class_name)
-        if not os.path.isdir(class_path) or class_name.startswith('.'):
-            continue
-
-        images = [f for f in os.listdir(class_path) if not f.startswith('.')]
-
-        # Collect all features
-        features = []
-        paths = []
-        for img_name in images:
-            img_path = os.path.join(class_path, img_name)
-            try:
-                img = Image.open(img_path).convert('L')
-                img_array = np.array(img)
-                features.append([
-                    np.mean(img_array),
-                    np.std(img_array)
-                ])
-                paths.append((img_path, img_name))
-            except:
-                pass
-
-        features = np.array(features)
+    classes = []
+    tasks = []
+    for class_name, class_path in scan_class_dirs(base_path):
+        images = list_images(class_path)
+        classes.append(class_name)
+        tasks.extend((class_name, os.path.join(class_path, img_name)) for img_name in images)
+
+    # Collect all features
+    results = _extract_all(tasks)
+
+    for class_name in classes:
+        img_paths, class_features = results[class_name]
+        paths = [(img_path, os.path.basename(img_path)) for img_path in img_paths]
+        features = class_features[:, :2]
         median = np.median(features, axis=0)
 
         # Calculate distance from median
-        distances = np.sqrt(np.sum((features - median)**2, axis=1))
+        offsets = features - median
+        distances = np.sqrt(np.einsum('ij,ij->i', offsets, offsets))
 
-        # Get top 5 most extreme
-        extreme_indices = np.argsort(distances)[-5:]
+        # Get top 5 most extreme (partial selection, then order only those)
+        k = min(5, distances.size)
+        extreme_indices = np.argpartition(distances, -k)[-k:]
+        extreme_indices = extreme_indices[np.argsort(distances[extreme_indices])]
 
         print(f"\nClass {class_name}: Top 5 most extreme outliers:")
         class_outlier_dir = os.path.join(output_dir, class_name)
@@ -165,6 +225,9 @@ def main():
     print("DATA QUALITY DIAGNOSTIC TOOL")
     print("="*60)
 
+    # Compile the stats kernel once before the worker pool forks
+    image_stats(np.zeros(1, dtype=np.uint8))
+
     # Run diagnostics
     analyze_class_similarity('dataset/train')
     compare_train_val_distribution('dataset/train', 'dataset/val')
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of per-image feature vectors
+Shared by the diagnostic and cleaning scripts so unchanged files are never
+decoded twice across runs
+"""
+
+import os
+import sqlite3
+import numpy as np
+from dataset_utils import FEATURE_SIZE, FEATURE_VERSION
+
+DEFAULT_CACHE_PATH = 'features_cache.sqlite'
+DEFAULT_FEATURE_TAG = f"v{FEATURE_VERSION}:{FEATURE_SIZE[0]}x{FEATURE_SIZE[1]}"
+
+class FeatureCache:
+    """SQLite-backed feature store keyed by (path, mtime, size)
+
+    The whole store is tagged with the feature definition (version and
+    thumbnail size); opening it with a different tag drops every entry.
+    """
+
+    def __init__(self, db_path=DEFAULT_CACHE_PATH, feature_tag=DEFAULT_FEATURE_TAG):
+        self.conn = sqlite3.connect(db_path)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS features "
+                "(path TEXT PRIMARY KEY, mtime REAL, size INTEGER, feat BLOB)"
+            )
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'feature_tag'").fetchone()
+            if row is None or row[0] != feature_tag:
+                if row is not None:
+                    print(f"Feature definition changed ({row[0]} -> {feature_tag}), discarding cached features")
+                self.conn.execute("DELETE FROM features")
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('feature_tag', ?)", (feature_tag,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def lookup(self, paths):
+        """Return {path: features} for every path whose cached entry is still fresh"""
+        by_key = {os.path.abspath(path): path for path in paths}
+        # One join against a temp table instead of a SELECT per path
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (path TEXT PRIMARY KEY)")
+        with self.conn:
+            self.conn.execute("DELETE FROM wanted")
+            self.conn.executemany("INSERT OR IGNORE INTO wanted VALUES (?)", ((key,) for key in by_key))
+        rows = self.conn.execute(
+            "SELECT f.path, f.mtime, f.size, f.feat FROM features f JOIN wanted w ON f.path = w.path"
+        ).fetchall()
+        hits = {}
+        for key, mtime, size, feat in rows:
+            path = by_key[key]
+            st = os.stat(path)
+            if mtime == st.st_mtime and size == st.st_size:
+                hits[path] = np.frombuffer(feat, dtype=np.float64)
+        return hits
+
+    def store(self, items):
+        """Write (path, features) pairs back in a single transaction"""
+        rows = []
+        for path, feat in items:
+            st = os.stat(path)
+            rows.append((os.path.abspath(path), st.st_mtime, st.st_size,
+                         np.asarray(feat, dtype=np.float64).tobytes()))
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO features VALUES (?, ?, ?, ?)", rows)
@@ -5,45 +5,130 @@ Duplicates in wrong classes are mislabeled!
 """
 
 import os
+import sys
+import multiprocessing
 import numpy as np
-from PIL import Image
 import hashlib
 from collections import defaultdict
+from dataset_utils import list_images, load_grayscale, scan_class_dirs
+
+try:
+    import xxhash
+except ImportError:  # xxhash is optional; fall back to hashlib
+    xxhash = None
+
+try:
+    import imagehash
+except ImportError:  # only needed for near-duplicate (phash) mode
+    imagehash = None
 
 def get_image_hash(img_path):
     """Get hash of image for duplicate detection"""
     try:
-        img = Image.open(img_path).convert('L')
+        img = load_grayscale(img_path)
         img = img.resize((32, 32))  # Normalize size
         img_array = np.array(img)
+        if xxhash is not None:
+            return xxhash.xxh3_64_intdigest(img_array.tobytes())
         return hashlib.md5(img_array.tobytes()).hexdigest()
     except:
         return None
 
-def find_duplicate_images(base_path='dataset/train'):
-    """Find images that appear in multiple classes (likely mislabeled)"""
+def get_image_phash(img_path):
+    """Get perceptual hash of image for near-duplicate detection"""
+    try:
+        return imagehash.phash(load_grayscale(img_path))
+    except:
+        return None
+
+def _hash_task(task):
+    """Pool worker: hash one (class_name, img_name, img_path, phash_mode) task"""
+    class_name, img_name, img_path, phash_mode = task
+    img_hash = get_image_phash(img_path) if phash_mode else get_image_hash(img_path)
+    return img_hash, (class_name, img_name, img_path)
+
+class BKTree:
+    """Burkhard-Keller tree for Hamming-distance lookups over perceptual hashes"""
+
+    def __init__(self):
+        self.root = None
+
+    def add(self, img_hash, value):
+        node = [img_hash, value, {}]
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            dist = img_hash - current[0]
+            child = current[2].get(dist)
+            if child is None:
+                current[2][dist] = node
+                return
+            current = child
+
+    def find(self, img_hash, max_distance):
+        """Return the values of all hashes within max_distance of img_hash"""
+        matches = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node_hash, value, children = stack.pop()
+            dist = img_hash - node_hash
+            if dist <= max_distance:
+                matches.append(value)
+            for child_dist, child in children.items():
+                if dist - max_distance <= child_dist <= dist + max_distance:
+                    stack.append(child)
+        return matches
+
+def group_near_duplicates(hashed_images, max_distance=4):
+    """Group (phash, image) pairs whose hashes are within max_distance bits"""
+    tree = BKTree()
+    groups = {}
+    for img_hash, image in hashed_images:
+        matches = tree.find(img_hash, max_distance)
+        if matches:
+            groups[matches[0]].append(image)
+        else:
+            key = str(img_hash)
+            tree.add(img_hash, key)
+            groups.setdefault(key, []).append(image)
+    return groups
+
+def find_duplicate_images(base_path='dataset/train', phash_mode=False):
+    """Find images that appear in multiple classes (likely mislabeled)
+
+    With phash_mode=True, near-duplicates (e.g. re-saved JPEGs) are grouped by
+    perceptual hash instead of requiring identical thumbnails.
+    """
     print("="*60)
     print("SEARCHING FOR DUPLICATE IMAGES ACROSS CLASSES")
     print("="*60)
 
-    hash_to_images = defaultdict(list)
+    if phash_mode and imagehash is None:
+        raise ImportError("phash_mode requires the 'imagehash' package")
 
     # Collect all images and their hashes
-    classes = sorted([d for d in os.listdir(base_path)
-                     if os.path.isdir(os.path.join(base_path, d)) and not d.startswith('.')])
-
-    for class_name in classes:
-        class_path = os.path.join(base_path, class_name)
-        images = [f for f in os.listdir(class_path) if not f.startswith('.')]
+    tasks = []
+    for class_name, class_path in scan_class_dirs(base_path):
+        images = list_images(class_path)
 
         print(f"Processing class {class_name}... ({len(images)} images)")
 
         for img_name in images:
-            img_path = os.path.join(class_path, img_name)
-            img_hash = get_image_hash(img_path)
+            tasks.append((class_name, img_name, os.path.join(class_path, img_name), phash_mode))
+
+    with multiprocessing.Pool(os.cpu_count()) as pool:
+        hashed_images = [(img_hash, image)
+                         for img_hash, image in pool.imap(_hash_task, tasks, chunksize=32)
+                         if img_hash is not None]
 
-            if img_hash:
-                hash_to_images[img_hash].append((class_name, img_name, img_path))
+    if phash_mode:
+        hash_to_images = group_near_duplicates(hashed_images)
+    else:
+        hash_to_images = defaultdict(list)
+        for img_hash, image in hashed_images:
+            hash_to_images[img_hash].append(image)
 
     # Find duplicates
     duplicates = {h: imgs for h, imgs in hash_to_images.items() if len(imgs) > 1}
@@ -92,7 +177,7 @@ def find_duplicate_images(base_path='dataset/train'):
     return cross_class_duplicates
 
 if __name__ == "__main__":
-    duplicates = find_duplicate_images('dataset/train')
+    duplicates = find_duplicate_images('dataset/train', phash_mode='--phash' in sys.argv)
 
     print("\n" + "="*60)
     print("NEXT STEPS:")
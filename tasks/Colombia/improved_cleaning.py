@@ -4,46 +4,186 @@ Improved Data Cleaning with More Aggressive Outlier Removal
 """
 
 import os
+import math
+import pickle
 import shutil
+import multiprocessing
 import numpy as np
 from PIL import Image, ImageEnhance, ImageFilter, ImageOps
 import random
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataset_utils import count_images, list_images, scan_class_dirs
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; fall back to plain NumPy reductions
+    njit = None
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _img_stats(a):
+        """One pass over a 2-D uint8 image: (mean, std, min, max, edge intensity)
+
+        Edge intensity is mean |grad_x| + mean |grad_y|; mean/std use Welford.
+        """
+        h, w = a.shape
+        n = 0
+        mean = 0.0
+        m2 = 0.0
+        mn = 255
+        mx = 0
+        gx = 0
+        gy = 0
+        for i in range(h):
+            for j in range(w):
+                v = np.int64(a[i, j])
+                n += 1
+                delta = v - mean
+                mean += delta / n
+                m2 += delta * (v - mean)
+                if v < mn:
+                    mn = v
+                if v > mx:
+                    mx = v
+                if j + 1 < w:
+                    gx += abs(np.int64(a[i, j + 1]) - v)
+                if i + 1 < h:
+                    gy += abs(np.int64(a[i + 1, j]) - v)
+        edge = gx / (h * (w - 1)) + gy / ((h - 1) * w)
+        return mean, np.sqrt(m2 / n), mn, mx, edge
+else:
+    def _img_stats(a):
+        """NumPy fallback returning (mean, std, min, max, edge intensity)"""
+        # One int16 copy (no uint8 wraparound), strided differences, abs in place
+        w = a.astype(np.int16)
+        grad_x = np.subtract(w[:, 1:], w[:, :-1])
+        grad_y = np.subtract(w[1:, :], w[:-1, :])
+        np.abs(grad_x, out=grad_x)
+        np.abs(grad_y, out=grad_y)
+        return a.mean(), a.std(), int(a.min()), int(a.max()), grad_x.mean() + grad_y.mean()
+
+def _quantiles(a, qs=(0.25, 0.5, 0.75)):
+    """Linearly interpolated quantiles (like np.percentile) from one np.partition call"""
+    flat = a.ravel()
+    positions = [q * (flat.size - 1) for q in qs]
+    kth = sorted({int(math.floor(pos)) for pos in positions} | {int(math.ceil(pos)) for pos in positions})
+    part = np.partition(flat, kth)
+    values = []
+    for pos in positions:
+        lo, hi = int(math.floor(pos)), int(math.ceil(pos))
+        values.append(float(part[lo]) + (float(part[hi]) - float(part[lo])) * (pos - lo))
+    return values
 
 random.seed(42)
 np.random.seed(42)
 
-def count_images(base_path):
-    """Count images in each class"""
-    counts = {}
-    for class_name in sorted(os.listdir(base_path)):
-        class_path = os.path.join(base_path, class_name)
-        if os.path.isdir(class_path) and not class_name.startswith('.'):
-            images = [f for f in os.listdir(class_path) if not f.startswith('.')]
-            counts[class_name] = len(images)
-    return counts
+def _fast_copy(src, dst):
+    """Hardlink src to dst, falling back to a kernel-offloaded copy where links fail
+
+    That covers crossing filesystems as well as filesystems without hardlinks.
+    """
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+    return dst
+
+PIXEL_CACHE_PATH = 'pixel_cache'
+CACHEABLE_MODES = ('L', 'RGB', 'RGBA')
+
+class PixelCache:
+    """Decoded images packed into one ragged uint8 memmap
+
+    The index maps 'split/class/name' to (offset, shape, mode, size, mtime),
+    so reruns slice pixels straight out of the memmap instead of decoding
+    files. Keys are relative to the dataset root, which keeps same-named files
+    in train and val apart while letting derived trees of hardlinked files
+    (e.g. the cleaned set) hit the same entries.
+    """
+
+    def __init__(self, cache_path=PIXEL_CACHE_PATH):
+        with open(cache_path + '.idx', 'rb') as f:
+            self.index = pickle.load(f)
+        bin_path = cache_path + '.bin'
+        # np.memmap refuses empty files (no images, or an interrupted first build)
+        if os.path.exists(bin_path) and os.path.getsize(bin_path) > 0:
+            self.data = np.memmap(bin_path, dtype=np.uint8, mode='r')
+        else:
+            self.index = {}
+            self.data = np.empty(0, dtype=np.uint8)
+
+    @staticmethod
+    def key(img_path):
+        class_path, img_name = os.path.split(os.path.normpath(img_path))
+        split_path, class_name = os.path.split(class_path)
+        return os.path.join(os.path.basename(split_path), class_name, img_name)
+
+    @staticmethod
+    def build(base_path, cache_path=PIXEL_CACHE_PATH):
+        """Decode every image under base_path once and append its pixels to the memmap file"""
+        index = {}
+        offset = 0
+        with open(cache_path + '.bin', 'wb') as out:
+            for class_name, class_path in scan_class_dirs(base_path):
+                for img_name in sorted(list_images(class_path)):
+                    img_path = os.path.join(class_path, img_name)
+                    try:
+                        with Image.open(img_path) as img:
+                            if img.mode not in CACHEABLE_MODES:
+                                continue
+                            arr = np.asarray(img)
+                            mode = img.mode
+                    except:
+                        continue
+                    st = os.stat(img_path)
+                    out.write(arr.tobytes())
+                    index[PixelCache.key(img_path)] = (offset, arr.shape, mode, st.st_size, st.st_mtime)
+                    offset += arr.nbytes
+        with open(cache_path + '.idx', 'wb') as f:
+            pickle.dump(index, f)
+
+    def get(self, img_path):
+        """Return the cached image for img_path, or None if missing or stale"""
+        entry = self.index.get(self.key(img_path))
+        if entry is None:
+            return None
+        offset, shape, mode, size, mtime = entry
+        st = os.stat(img_path)
+        if st.st_size != size or st.st_mtime != mtime:
+            return None
+        n = int(np.prod(shape))
+        return Image.fromarray(np.array(self.data[offset:offset + n]).reshape(shape), mode)
+
+_pixel_cache = None
+
+def open_pixel_cache(base_path, cache_path=PIXEL_CACHE_PATH):
+    """Load the pixel cache, building it from base_path on the first run"""
+    global _pixel_cache
+    if not os.path.exists(cache_path + '.idx'):
+        print(f"Building pixel cache from {base_path}...")
+        PixelCache.build(base_path, cache_path)
+    _pixel_cache = PixelCache(cache_path)
+
+def load_image(img_path):
+    """Open an image, using the pixel cache when it has a fresh entry"""
+    if _pixel_cache is not None:
+        img = _pixel_cache.get(img_path)
+        if img is not None:
+            return img
+    return Image.open(img_path)
 
 def get_advanced_features(img_path):
     """Extract more comprehensive features for better outlier detection"""
     try:
-        img = Image.open(img_path).convert('L')
-        img_array = np.array(img)
+        img = load_image(img_path).convert('L')
+        img_array = np.asarray(img, dtype=np.uint8)
 
-        # Basic statistics
-        mean_val = np.mean(img_array)
-        std_val = np.std(img_array)
-        min_val = np.min(img_array)
-        max_val = np.max(img_array)
+        # Basic statistics and edge detection (mean absolute gradient) in one pass
+        mean_val, std_val, min_val, max_val, edge_intensity = _img_stats(img_array)
 
         # Additional features
-        median_val = np.median(img_array)
-        q25 = np.percentile(img_array, 25)
-        q75 = np.percentile(img_array, 75)
-
-        # Edge detection (count of high gradients)
-        grad_x = np.abs(np.diff(img_array, axis=1))
-        grad_y = np.abs(np.diff(img_array, axis=0))
-        edge_intensity = np.mean(grad_x) + np.mean(grad_y)
+        q25, median_val, q75 = _quantiles(img_array)
 
         # Contrast
         contrast = max_val - min_val
@@ -52,51 +192,49 @@ def get_advanced_features(img_path):
     except:
         return None
 
+def _advanced_features_task(img_path):
+    """Pool worker: return (img_path, features) so results stay aligned with paths"""
+    return img_path, get_advanced_features(img_path)
+
 def find_outliers_advanced(base_path):
     """More aggressive outlier detection"""
     outliers_info = {}
     stats_info = {}
 
-    for class_name in sorted(os.listdir(base_path)):
-        class_path = os.path.join(base_path, class_name)
-        if not os.path.isdir(class_path) or class_name.startswith('.'):
-            continue
+    # One pool for all classes so worker start-up is paid once
+    with multiprocessing.Pool(os.cpu_count()) as pool:
+        for class_name, class_path in scan_class_dirs(base_path):
+            print(f"Analyzing class: {class_name}")
+            images = list_images(class_path)
 
-        print(f"Analyzing class: {class_name}")
-        images = [f for f in os.listdir(class_path) if not f.startswith('.')]
+            features = []
+            image_paths = []
 
-        features = []
-        image_paths = []
+            all_paths = [os.path.join(class_path, img_name) for img_name in images]
+            for img_path, feat in pool.imap_unordered(_advanced_features_task, all_paths, chunksize=32):
+                if feat is not None:
+                    features.append(feat)
+                    image_paths.append(img_path)
 
-        for img_name in images:
-            img_path = os.path.join(class_path, img_name)
-            feat = get_advanced_features(img_path)
-            if feat is not None:
-                features.append(feat)
-                image_paths.append(img_path)
-
-        features = np.array(features)
-
-        # More aggressive outlier detection: use 1.0 * IQR instead of 1.5 * IQR
-        Q1 = np.percentile(features, 25, axis=0)
-        Q3 = np.percentile(features, 75, axis=0)
-        IQR = Q3 - Q1
-
-        # Tighter bounds for outlier detection
-        outlier_mask = np.any(
-            (features < (Q1 - 1.0 * IQR)) | (features > (Q3 + 1.0 * IQR)),
-            axis=1
-        )
-        outlier_indices = np.where(outlier_mask)[0]
-
-        print(f"  Found {len(outlier_indices)} potential outliers out of {len(images)} images")
-        outliers_info[class_name] = [image_paths[i] for i in outlier_indices]
-
-        # Store statistics for analysis
-        stats_info[class_name] = {
-            'mean': np.mean(features, axis=0),
-            'std': np.std(features, axis=0)
-        }
+            features = np.array(features)
+
+            # More aggressive outlier detection: use 1.0 * IQR instead of 1.5 * IQR
+            Q1, Q3 = np.percentile(features, [25, 75], axis=0)
+            IQR = Q3 - Q1
+
+            # Tighter bounds for outlier detection
+            lo, hi = Q1 - 1.0 * IQR, Q3 + 1.0 * IQR
+            outlier_mask = ((features < lo) | (features > hi)).any(axis=1)
+            outlier_indices = np.where(outlier_mask)[0]
+
+            print(f"  Found {len(outlier_indices)} potential outliers out of {len(images)} images")
+            outliers_info[class_name] = [image_paths[i] for i in outlier_indices]
+
+            # Store statistics for analysis
+            stats_info[class_name] = {
+                'mean': np.mean(features, axis=0),
+                'std': np.std(features, axis=0)
+            }
 
     return outliers_info, stats_info
 
@@ -107,28 +245,25 @@ def create_cleaned_dataset(base_path, outliers_dict, output_path, removal_rate=0
     removed_count = 0
     kept_count = 0
 
-    for class_name in sorted(os.listdir(base_path)):
-        class_path = os.path.join(base_path, class_name)
-        if not os.path.isdir(class_path) or class_name.startswith('.'):
-            continue
-
+    for class_name, class_path in scan_class_dirs(base_path):
         output_class_path = os.path.join(output_path, class_name)
         os.makedirs(output_class_path, exist_ok=True)
 
-        outlier_set = set(outliers_dict.get(class_name, []))
+        # Draw every removal decision for the class at once, in path order so the
+        # seeded draws don't depend on the order the feature pool returned them
+        outlier_list = sorted(outliers_dict.get(class_name, []))
+        draws = np.random.random(len(outlier_list))
+        removed_set = {p for p, r in zip(outlier_list, draws) if r < removal_rate}
 
-        for img_name in os.listdir(class_path):
-            if img_name.startswith('.'):
-                continue
+        for img_name in list_images(class_path):
             img_path = os.path.join(class_path, img_name)
 
             # Remove more outliers
-            if img_path in outlier_set and len(outlier_set) > 0:
-                if random.random() < removal_rate:
-                    removed_count += 1
-                    continue
+            if img_path in removed_set:
+                removed_count += 1
+                continue
 
-            shutil.copy(img_path, output_class_path)
+            _fast_copy(img_path, os.path.join(output_class_path, img_name))
             kept_count += 1
 
     print(f"\nCleaning complete:")
@@ -137,43 +272,46 @@ def create_cleaned_dataset(base_path, outliers_dict, output_path, removal_rate=0
 
     return output_path
 
-def augment_image_improved(img, aug_type):
-    """More diverse and stronger augmentation"""
+def augment_image_improved(img, aug_type, rng=random):
+    """More diverse and stronger augmentation
+
+    rng lets concurrent callers pass their own random.Random instance.
+    """
     if aug_type == 'rotate_small':
-        angle = random.randint(-20, 20)  # Increased from -15 to -20
+        angle = rng.randint(-20, 20)  # Increased from -15 to -20
         return img.rotate(angle, fillcolor=255, expand=False)
 
     elif aug_type == 'rotate_medium':
-        angle = random.choice([-10, -5, 5, 10])
+        angle = rng.choice([-10, -5, 5, 10])
         return img.rotate(angle, fillcolor=255)
 
     elif aug_type == 'brightness':
         enhancer = ImageEnhance.Brightness(img)
-        factor = random.uniform(0.6, 1.4)  # Wider range
+        factor = rng.uniform(0.6, 1.4)  # Wider range
         return enhancer.enhance(factor)
 
     elif aug_type == 'contrast':
         enhancer = ImageEnhance.Contrast(img)
-        factor = random.uniform(0.7, 1.4)  # Wider range
+        factor = rng.uniform(0.7, 1.4)  # Wider range
         return enhancer.enhance(factor)
 
     elif aug_type == 'sharpness':
         enhancer = ImageEnhance.Sharpness(img)
-        factor = random.uniform(0.5, 2.0)
+        factor = rng.uniform(0.5, 2.0)
         return enhancer.enhance(factor)
 
     elif aug_type == 'blur':
-        radius = random.uniform(0.3, 2.0)
+        radius = rng.uniform(0.3, 2.0)
         return img.filter(ImageFilter.GaussianBlur(radius=radius))
 
     elif aug_type == 'shift':
-        shift_x = random.randint(-4, 4)  # Increased from -3
-        shift_y = random.randint(-4, 4)
+        shift_x = rng.randint(-4, 4)  # Increased from -3
+        shift_y = rng.randint(-4, 4)
         return img.transform(img.size, Image.AFFINE, (1, 0, shift_x, 0, 1, shift_y), fillcolor=255)
 
     elif aug_type == 'zoom':
         # Slight zoom in/out
-        scale = random.uniform(0.9, 1.1)
+        scale = rng.uniform(0.9, 1.1)
         w, h = img.size
         new_w, new_h = int(w * scale), int(h * scale)
         resized = img.resize((new_w, new_h), Image.LANCZOS)
@@ -192,18 +330,27 @@ def augment_image_improved(img, aug_type):
 
     elif aug_type == 'invert':
         # Occasionally useful for handwritten digits
-        if random.random() < 0.3:  # Only 30% chance
+        if rng.random() < 0.3:  # Only 30% chance
+            if img.mode in ('L', 'RGB'):
+                # Plain 255 - x, without the round trip through RGB
+                return Image.fromarray(np.subtract(255, np.asarray(img), dtype=np.uint8), mode=img.mode)
             return ImageOps.invert(img.convert('RGB')).convert(img.mode)
         return img
 
     elif aug_type == 'combined':
         # Apply multiple augmentations
-        img = augment_image_improved(img, 'rotate_small')
-        img = augment_image_improved(img, random.choice(['brightness', 'contrast']))
+        img = augment_image_improved(img, 'rotate_small', rng)
+        img = augment_image_improved(img, rng.choice(['brightness', 'contrast']), rng)
         return img
 
     return img
 
+def _augment_one(task):
+    """Thread worker: augment and save one planned augmentation"""
+    img, out_path, aug_type, seed = task
+    augmented_img = augment_image_improved(img, aug_type, random.Random(seed))
+    augmented_img.save(out_path)
+
 def balance_and_augment_improved(cleaned_path, output_path, target_per_class=300):
     """Enhanced augmentation strategy"""
     os.makedirs(output_path, exist_ok=True)
@@ -213,43 +360,45 @@ def balance_and_augment_improved(cleaned_path, output_path, target_per_class=300
         'sharpness', 'blur', 'shift', 'zoom', 'combined'
     ]
 
-    for class_name in sorted(os.listdir(cleaned_path)):
-        class_path = os.path.join(cleaned_path, class_name)
-        if not os.path.isdir(class_path) or class_name.startswith('.'):
-            continue
-
+    for class_name, class_path in scan_class_dirs(cleaned_path):
         output_class_path = os.path.join(output_path, class_name)
         os.makedirs(output_class_path, exist_ok=True)
 
-        images = [f for f in os.listdir(class_path) if not f.startswith('.')]
+        images = list_images(class_path)
         current_count = len(images)
 
         print(f"\nClass {class_name}: {current_count} images -> targeting {target_per_class}")
 
         # Copy original images
         for img_name in images:
-            shutil.copy(os.path.join(class_path, img_name), output_class_path)
+            _fast_copy(os.path.join(class_path, img_name), os.path.join(output_class_path, img_name))
 
         # Augment to reach target
         needed = target_per_class - current_count
         if needed > 0:
-            augmented = 0
-            while augmented < needed:
-                img_name = random.choice(images)
-                img_path = os.path.join(class_path, img_name)
-                img = Image.open(img_path)
-
-                # Use more diverse augmentation
-                aug_type = random.choice(augmentation_types)
-                augmented_img = augment_image_improved(img, aug_type)
-
+            # Plan every augmentation up front; per-task seeds keep the threaded run reproducible
+            # Draw all sources and (more diverse) augmentation types in two batch calls
+            img_names_batch = random.choices(images, k=needed)
+            aug_batch = random.choices(augmentation_types, k=needed)
+            plan = []
+            for augmented, (img_name, aug_type) in enumerate(zip(img_names_batch, aug_batch)):
                 base_name = os.path.splitext(img_name)[0]
                 ext = os.path.splitext(img_name)[1]
                 aug_name = f"{base_name}_aug{augmented}_{aug_type}{ext}"
-                augmented_img.save(os.path.join(output_class_path, aug_name))
-                augmented += 1
+                plan.append((img_name, os.path.join(output_class_path, aug_name),
+                             aug_type, random.getrandbits(32)))
+
+            # Decode each drawn source once instead of once per augmentation
+            sources = {img_name: load_image(os.path.join(class_path, img_name)).copy()
+                       for img_name in set(item[0] for item in plan)}
+            tasks = [(sources[img_name], out_path, aug_type, seed)
+                     for img_name, out_path, aug_type, seed in plan]
+
+            # PIL releases the GIL while decoding, transforming and encoding
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                list(executor.map(_augment_one, tasks))
 
-            print(f"  Added {augmented} augmented images")
+            print(f"  Added {len(tasks)} augmented images")
 
     return output_path
 
@@ -259,6 +408,12 @@ def main():
     print("More aggressive outlier removal + better augmentation")
     print("="*60)
 
+    # Compile the stats kernel once before the worker pool forks
+    _img_stats(np.zeros((2, 2), dtype=np.uint8))
+
+    # Reruns read decoded pixels from the memmap instead of the image files
+    open_pixel_cache('dataset/train')
+
     # Step 1: Find outliers with advanced detection
     print("\n[1/5] Advanced outlier detection...")
     outliers, stats = find_outliers_advanced('dataset/train')
@@ -286,13 +441,13 @@ def main():
 
     # Step 4: Copy validation
     print("\n[4/5] Copying validation set...")
-    shutil.copytree('dataset/val', 'dataset_augmented_v2/val')
+    shutil.copytree('dataset/val', 'dataset_augmented_v2/val', copy_function=_fast_copy)
 
     # Step 5: Create data_original
     print("\n[5/5] Creating data_original...")
     if os.path.exists('data_original'):
         shutil.rmtree('data_original')
-    shutil.copytree('dataset_augmented_v2', 'data_original')
+    shutil.copytree('dataset_augmented_v2', 'data_original', copy_function=_fast_copy)
 
     # Final stats
     print("\n" + "="*60)
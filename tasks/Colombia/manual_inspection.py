@@ -7,12 +7,27 @@ Displays images from each class for visual inspection to find mislabeled samples
 import os
 import numpy as np
 from PIL import Image
+import matplotlib
+matplotlib.use('Agg')  # figures are only saved to PNG, skip GUI backend start-up
 import matplotlib.pyplot as plt
 import random
+from dataset_utils import list_images, scan_class_dirs
 
-def inspect_class(class_path, class_name, n_samples=50, grid_size=(5, 10)):
-    """Display random samples from a class for manual inspection"""
-    images = [f for f in os.listdir(class_path) if not f.startswith('.')]
+THUMB_SIZE = (64, 64)
+
+def load_thumbnail(img_path):
+    """Open an image for display, letting JPEG decode at a reduced scale"""
+    img = Image.open(img_path)
+    img.draft('L', THUMB_SIZE)
+    img.load()
+    return img
+
+def inspect_class(class_path, class_name, n_samples=50, grid_size=(5, 10), fig=None, axes=None):
+    """Display random samples from a class for manual inspection
+
+    Pass fig/axes from an earlier call to redraw into the same figure.
+    """
+    images = list_images(class_path)
 
     if len(images) == 0:
         print(f"No images in {class_name}")
@@ -21,11 +36,15 @@ def inspect_class(class_path, class_name, n_samples=50, grid_size=(5, 10)):
     # Sample images
     samples = random.sample(images, min(n_samples, len(images)))
 
-    fig, axes = plt.subplots(grid_size[0], grid_size[1], figsize=(20, 10))
+    owns_fig = fig is None
+    if owns_fig:
+        fig, axes = plt.subplots(grid_size[0], grid_size[1], figsize=(20, 10))
     fig.suptitle(f'Class: {class_name.upper()} ({len(images)} total images)',
                  fontsize=16, fontweight='bold')
 
     axes = axes.flatten()
+    for ax in axes:
+        ax.clear()
 
     for idx, img_name in enumerate(samples):
         if idx >= len(axes):
@@ -33,7 +52,7 @@ def inspect_class(class_path, class_name, n_samples=50, grid_size=(5, 10)):
 
         img_path = os.path.join(class_path, img_name)
         try:
-            img = Image.open(img_path)
+            img = load_thumbnail(img_path)
             axes[idx].imshow(img, cmap='gray')
             axes[idx].set_title(img_name[:15], fontsize=6)
             axes[idx].axis('off')
@@ -45,10 +64,11 @@ def inspect_class(class_path, class_name, n_samples=50, grid_size=(5, 10)):
     for idx in range(len(samples), len(axes)):
         axes[idx].axis('off')
 
-    plt.tight_layout()
-    plt.savefig(f'inspection_{class_name}.png', dpi=150, bbox_inches='tight')
+    fig.tight_layout()
+    fig.savefig(f'inspection_{class_name}.png', dpi=100, bbox_inches='tight')
     print(f"Saved: inspection_{class_name}.png")
-    plt.close()
+    if owns_fig:
+        plt.close(fig)
 
 def inspect_all_classes(base_path='dataset/train'):
     """Inspect all classes"""
@@ -63,38 +83,39 @@ def inspect_all_classes(base_path='dataset/train'):
     print("  4. Duplicates")
     print()
 
-    classes = sorted([d for d in os.listdir(base_path)
-                     if os.path.isdir(os.path.join(base_path, d)) and not d.startswith('.')])
+    class_dirs = scan_class_dirs(base_path)
 
-    for class_name in classes:
-        class_path = os.path.join(base_path, class_name)
+    # One figure reused for every class
+    grid_size = (5, 10)
+    fig, axes = plt.subplots(grid_size[0], grid_size[1], figsize=(20, 10))
+    for class_name, class_path in class_dirs:
         print(f"\nInspecting class: {class_name}")
-        inspect_class(class_path, class_name, n_samples=50, grid_size=(5, 10))
+        inspect_class(class_path, class_name, n_samples=50, grid_size=grid_size, fig=fig, axes=axes)
+    plt.close(fig)
 
     print("\n" + "="*60)
     print("INSPECTION COMPLETE")
     print("="*60)
     print("\nReview the generated PNG files:")
-    for class_name in classes:
+    for class_name, _ in class_dirs:
         print(f"  - inspection_{class_name}.png")
     print("\nLook for obvious mislabeled images and note their filenames.")
 
 def compare_classes_side_by_side(base_path='dataset/train', n_per_class=20):
     """Show all classes side by side for easy comparison"""
-    classes = sorted([d for d in os.listdir(base_path)
-                     if os.path.isdir(os.path.join(base_path, d)) and not d.startswith('.')])
+    class_dirs = scan_class_dirs(base_path)
+    classes = [class_name for class_name, _ in class_dirs]
 
     fig, axes = plt.subplots(len(classes), n_per_class, figsize=(24, 2*len(classes)))
 
-    for i, class_name in enumerate(classes):
-        class_path = os.path.join(base_path, class_name)
-        images = [f for f in os.listdir(class_path) if not f.startswith('.')]
+    for i, (class_name, class_path) in enumerate(class_dirs):
+        images = list_images(class_path)
         samples = random.sample(images, min(n_per_class, len(images)))
 
         for j, img_name in enumerate(samples):
             img_path = os.path.join(class_path, img_name)
             try:
-                img = Image.open(img_path)
+                img = load_thumbnail(img_path)
                 axes[i, j].imshow(img, cmap='gray')
                 axes[i, j].axis('off')
                 if j == 0:
@@ -110,7 +131,7 @@ def compare_classes_side_by_side(base_path='dataset/train', n_per_class=20):
 
     plt.suptitle('All Classes Side-by-Side Comparison', fontsize=16, fontweight='bold')
     plt.tight_layout()
-    plt.savefig('all_classes_comparison.png', dpi=150, bbox_inches='tight')
+    plt.savefig('all_classes_comparison.png', dpi=100, bbox_inches='tight')
     print("\nSaved: all_classes_comparison.png")
     print("Use this to spot which images don't match their class!")
     plt.close()
@@ -167,6 +167,19 @@ if [ -f "requirements.txt" ]; then
     echo "Installing requirements..."
     pip install -r requirements.txt
     echo -e "${GREEN}[OK] Dependencies installed successfully${NC}"
+
+    # Optional: swap in Pillow-SIMD (same PIL API, SSE4/AVX2 resize/filter/affine)
+    # for the image cleaning and augmentation scripts. Enable with PILLOW_SIMD=1.
+    if [ "${PILLOW_SIMD:-0}" = "1" ]; then
+        echo "Replacing Pillow with Pillow-SIMD..."
+        pip uninstall -y pillow --quiet
+        if CC="cc -mavx2" pip install --no-cache-dir pillow-simd; then
+            echo -e "${GREEN}[OK] Pillow-SIMD installed${NC}"
+        else
+            echo -e "${YELLOW}[WARNING] Pillow-SIMD build failed, restoring Pillow${NC}"
+            pip install -r requirements.txt --quiet
+        fi
+    fi
 else
     echo -e "${YELLOW}[WARNING] No requirements.txt found, skipping dependency installation${NC}"
 fi
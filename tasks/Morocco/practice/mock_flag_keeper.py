@@ -25,7 +25,10 @@ XOR_KEY = b"simple_xor_key"
 DUMMY_FLAG = "FLAG{practice_morocco_dummy_flag_2025}"
 
 def xor_bytes(data: bytes, key: bytes) -> bytes:
-    return bytes(b ^ key[i % len(key)] for i, b in enumerate(data))
+    # Tile the key to the data length and XOR both as big integers in one C-level op
+    reps, rem = divmod(len(data), len(key))
+    tiled = key * reps + key[:rem]
+    return (int.from_bytes(data, "big") ^ int.from_bytes(tiled, "big")).to_bytes(len(data), "big")
 
 def compute_hmac_hex(nonce: str, thought: str) -> str:
     msg = (nonce + "|" + thought).encode("utf-8")
@@ -49,25 +52,21 @@ def submit():
         return jsonify({"ok": False, "error": "bad-base64", "detail": str(e)}), 400
 
     # Combined format: hmac_hex (64 ascii hex chars) + b'|' + enc_blob
-    try:
-        hmac_hex, enc_blob = combined.split(b"|", 1)
-    except ValueError:
+    # Locate the separator once and slice instead of splitting into copies
+    sep = combined.find(b"|")
+    if sep < 0:
         return jsonify({"ok": False, "error": "bad-format-combined"}), 400
-
-    try:
-        hmac_hex = hmac_hex.decode("ascii")
-    except Exception:
-        return jsonify({"ok": False, "error": "bad-hmac-encoding"}), 400
+    hmac_hex = combined[:sep]
 
     # enc_blob is base64 of XORed plaintext_json
     try:
-        xor_payload = base64.b64decode(enc_blob)
+        xor_payload = base64.b64decode(memoryview(combined)[sep + 1:])
     except Exception as e:
         return jsonify({"ok": False, "error": "bad-enc-base64", "detail": str(e)}), 400
 
     # reverse XOR
     try:
-        plaintext_bytes = bytes(b ^ XOR_KEY[i % len(XOR_KEY)] for i, b in enumerate(xor_payload))
+        plaintext_bytes = xor_bytes(xor_payload, XOR_KEY)
         plaintext_json = json.loads(plaintext_bytes.decode("utf-8"))
     except Exception as e:
         return jsonify({"ok": False, "error": "bad-decryption", "detail": str(e)}), 400
@@ -79,7 +78,8 @@ def submit():
 
     # verify HMAC
     expected = compute_hmac_hex(nonce, thought)
-    if not hmac.compare_digest(expected, hmac_hex):
+    # Compare as bytes so the received digest never needs an ascii decode
+    if not hmac.compare_digest(expected.encode("ascii"), hmac_hex):
         return jsonify({"ok": False, "error": "bad-hmac", "expected": expected}), 403
 
     # check nonce freshness (allow 60s)
@@ -6,7 +6,10 @@ XOR_KEY = b"simple_xor_key"
 SECRET_HMAC = b"mock_hmac_secret_2025"
 
 def xor_bytes(data: bytes, key: bytes) -> bytes:
-    return bytes(b ^ key[i % len(key)] for i, b in enumerate(data))
+    # Tile the key to the data length and XOR both as big integers in one C-level op
+    reps, rem = divmod(len(data), len(key))
+    tiled = key * reps + key[:rem]
+    return (int.from_bytes(data, "big") ^ int.from_bytes(tiled, "big")).to_bytes(len(data), "big")
 
 def compute_hmac_hex(nonce: str, thought: str) -> str:
     return hmac.new(SECRET_HMAC, (nonce + '|' + thought).encode(), hashlib.sha256).hexdigest()
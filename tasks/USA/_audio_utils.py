@@ -0,0 +1,259 @@
+"""
+Audio helpers shared by the USA task scripts
+
+Only the standard library is imported at module level, so light CLIs such as
+extract_region.py don't pay for numpy/torch/whisper on startup.
+"""
+
+import bisect
+import functools
+import os
+import subprocess
+
+try:
+    from mutagen import File as MutagenFile
+except ImportError:  # mutagen is optional; fall back to spawning ffprobe
+    MutagenFile = None
+
+@functools.lru_cache(maxsize=None)
+def get_duration(path):
+    """Get duration of audio file in seconds (memoized per path)
+
+    mutagen reads it from the file headers (Xing/VBRI for MP3) without
+    spawning a process; otherwise ffprobe is run with only stdout piped.
+    """
+    if MutagenFile is not None:
+        try:
+            info = MutagenFile(path)
+            if info is not None and info.info.length:
+                return float(info.info.length)
+        except Exception:
+            pass
+    cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+           '-of', 'default=noprint_wrappers=1:nokey=1', path]
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as proc:
+        out = proc.stdout.read()
+    return float(out)  # float() parses the raw bytes and ignores the newline
+
+def extract_to_file(path, start, dur, out, codec='copy'):
+    """Extract dur seconds starting at start seconds into out with ffmpeg
+
+    Seeks before -i (fast keyframe seek). The default stream-copies the MP3
+    frames; pass codec='libmp3lame' to re-encode.
+    """
+    cmd = ['ffmpeg', '-y', '-v', 'error', '-ss', str(start),
+           '-i', path, '-t', str(dur), '-c:a', codec]
+    if codec == 'libmp3lame':
+        cmd += ['-q:a', '4']
+    cmd.append(out)
+    subprocess.run(cmd, check=True)
+
+PIPE_BUFSIZE = 4 * 1024 * 1024  # a 30 s mono f32le chunk is ~1.9 MB
+
+def pipe_pcm(cmd):
+    """Run an ffmpeg command writing f32le to stdout and return the samples as a float32 array
+
+    Only stdout is piped, through a large buffer, so the PCM is read in a
+    few big reads rather than the 32 KB chunks of capture_output.
+    """
+    import numpy as np
+
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                          bufsize=PIPE_BUFSIZE) as proc:
+        out = proc.stdout.read()
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+    return np.frombuffer(out, dtype=np.float32)
+
+def extract_to_pcm(path, start, dur, sample_rate=16000):
+    """Decode dur seconds starting at start seconds to mono float32 PCM through an ffmpeg pipe"""
+    cmd = ['ffmpeg', '-v', 'error', '-ss', str(start),
+           '-i', path, '-t', str(dur),
+           '-f', 'f32le', '-acodec', 'pcm_f32le', '-ac', '1', '-ar', str(sample_rate), '-']
+    return pipe_pcm(cmd)
+
+def extract_many_to_pcm(path, starts, dur, sample_rate=16000):
+    """Decode dur seconds at each of several start offsets with a single ffmpeg process
+
+    Each segment is an input of its own (seeked with -ss) padded or trimmed
+    to exactly dur, so the concatenated f32le stream splits back evenly.
+    Returns one mono float32 array per start.
+    """
+    import numpy as np
+
+    n_samples = int(dur * sample_rate)
+    cmd = ['ffmpeg', '-v', 'error']
+    chains = []
+    for i, start in enumerate(starts):
+        cmd += ['-ss', str(start), '-t', str(dur), '-i', path]
+        chains.append(f"[{i}:a]aformat=sample_fmts=flt:channel_layouts=mono,aresample={sample_rate},"
+                      f"apad=whole_len={n_samples},atrim=end_sample={n_samples}[a{i}]")
+    inputs = "".join(f"[a{i}]" for i in range(len(starts)))
+    graph = ";".join(chains) + f";{inputs}concat=n={len(starts)}:v=0:a=1[out]"
+    cmd += ['-filter_complex', graph, '-map', '[out]', '-f', 'f32le', '-']
+    return np.split(pipe_pcm(cmd), len(starts))
+
+PCM_CACHE_DIR = ".pcm_cache"
+
+def cached_extract_many_to_pcm(path, starts, dur, sample_rate=16000, cache_dir=PCM_CACHE_DIR):
+    """extract_many_to_pcm with each decoded segment kept as .npy in cache_dir
+
+    Segments are keyed by the file's mtime, start, duration and sample rate,
+    so re-runs with other models or sample counts only decode what is new.
+    """
+    import hashlib
+    import numpy as np
+
+    mtime = os.path.getmtime(path)
+    cache_paths = [
+        os.path.join(cache_dir, hashlib.sha1(f"{path}|{mtime}|{start}|{dur}|{sample_rate}".encode()).hexdigest() + ".npy")
+        for start in starts
+    ]
+    audios = [np.load(cache_path) if os.path.exists(cache_path) else None for cache_path in cache_paths]
+    missing = [i for i, audio in enumerate(audios) if audio is None]
+    if missing:
+        os.makedirs(cache_dir, exist_ok=True)
+        for i, audio in zip(missing, extract_many_to_pcm(path, [starts[i] for i in missing], dur, sample_rate)):
+            np.save(cache_paths[i], audio)
+            audios[i] = audio
+    return audios
+
+def load_openai_key():
+    """Return the OpenAI API key from $OPENAI_API_KEY or ~/.config/openai/api_key, or None"""
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if api_key:
+        return api_key
+    try:
+        with open(os.path.expanduser("~/.config/openai/api_key")) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+_MODEL_CACHE = {}
+
+def default_model_size():
+    """large-v3-turbo when a CUDA device is available (4 decoder layers, near large-v3 accuracy), else base"""
+    import ctranslate2
+
+    return "large-v3-turbo" if ctranslate2.get_cuda_device_count() > 0 else "base"
+
+# Preferred compute types, best first: int8 weights with half-precision
+# activations (fp16 on Tensor Core GPUs, bf16 on AVX512-BF16/AMX CPUs when the
+# CTranslate2 build supports it), then plain int8
+COMPUTE_TYPES = ("int8_float16", "int8_bfloat16", "float16", "int8")
+
+def get_model(model_size):
+    """Load a faster-whisper (CTranslate2) model once per size and reuse it on later calls in the process
+
+    The compute type is the first of COMPUTE_TYPES the device supports.
+    """
+    if model_size not in _MODEL_CACHE:
+        import ctranslate2
+        from faster_whisper import WhisperModel
+
+        device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+        supported = ctranslate2.get_supported_compute_types(device)
+        compute_type = next((t for t in COMPUTE_TYPES if t in supported), "default")
+        # CTranslate2 uses only 4 CPU threads unless told otherwise
+        cpu_threads = (os.cpu_count() or 0) if device == "cpu" else 0
+        _MODEL_CACHE[model_size] = WhisperModel(model_size, device=device, compute_type=compute_type,
+                                                cpu_threads=cpu_threads)
+    return _MODEL_CACHE[model_size]
+
+@functools.lru_cache(maxsize=None)
+def _torch_feature_extractor_class():
+    """Define TorchFeatureExtractor on first use, so torch is only imported by callers on CUDA"""
+    import numpy as np
+    import torch
+    from faster_whisper.feature_extractor import FeatureExtractor
+
+    class TorchFeatureExtractor(FeatureExtractor):
+        """faster-whisper's log-Mel front end computed with torch on the given device
+
+        The mel filter bank and Hann window are moved to the device once, so the
+        STFT and filtering no longer run on the CPU ahead of every batch.
+        """
+
+        def __init__(self, device, **kwargs):
+            super().__init__(**kwargs)
+            self.device = device
+            self.mel_filters_t = torch.from_numpy(self.mel_filters).to(device)
+            self.window_t = torch.hann_window(self.n_fft, device=device)
+
+        def __call__(self, waveform, padding=160, chunk_length=None):
+            if chunk_length is not None:
+                self.n_samples = chunk_length * self.sampling_rate
+                self.nb_max_frames = self.n_samples // self.hop_length
+            audio = torch.from_numpy(np.asarray(waveform, dtype=np.float32)).to(self.device)
+            if padding:
+                audio = torch.nn.functional.pad(audio, (0, padding))
+            stft = torch.stft(audio, self.n_fft, self.hop_length, window=self.window_t, return_complex=True)
+            magnitudes = stft[..., :-1].abs() ** 2
+            log_spec = torch.clamp(self.mel_filters_t @ magnitudes, min=1e-10).log10()
+            log_spec = torch.maximum(log_spec, log_spec.max() - 8.0)
+            return ((log_spec + 4.0) / 4.0).cpu().numpy()
+
+    return TorchFeatureExtractor
+
+def use_torch_features(model):
+    """On CUDA, compute the model's log-Mel features on the GPU instead of in NumPy ahead of each batch
+
+    A no-op on CPU or when the model's extractor was already swapped.
+    """
+    if model.model.device != "cuda":
+        return model
+    extractor_class = _torch_feature_extractor_class()
+    fe = model.feature_extractor
+    if not isinstance(fe, extractor_class):
+        model.feature_extractor = extractor_class(
+            "cuda", feature_size=fe.mel_filters.shape[0], sampling_rate=fe.sampling_rate,
+            hop_length=fe.hop_length, chunk_length=fe.chunk_length, n_fft=fe.n_fft)
+    return model
+
+# Pauses longer than this are cut out by faster-whisper's VAD filter (its
+# sequential default is 2 s, which leaves most inter-sentence silence in)
+MIN_SILENCE_MS = 500
+
+MIN_SPEECH_SEC = 2.0  # clips with less speech than this (music, silence) are not worth transcribing
+
+def speech_only(audio, sample_rate=16000, min_speech_sec=MIN_SPEECH_SEC):
+    """Keep only the voiced spans of a waveform (Silero VAD), or None if under min_speech_sec"""
+    import numpy as np
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    spans = get_speech_timestamps(audio, VadOptions(min_speech_duration_ms=500), sampling_rate=sample_rate)
+    if sum(span["end"] - span["start"] for span in spans) < min_speech_sec * sample_rate:
+        return None
+    return np.concatenate([audio[span["start"]:span["end"]] for span in spans])
+
+CLIP_SEC = 30  # Whisper window; longer waveforms are split into clips of this size
+
+def transcribe_clips(batched, audios, batch_size=16, sample_rate=16000):
+    """Transcribe several waveforms in one BatchedInferencePipeline pass, returning one transcript each
+
+    The waveforms are laid end to end and cut into <=30s clips, so the
+    encoder sees them as one batch; segments are mapped back to their
+    waveform by time. The pipeline slices the audio by the clips' start/end,
+    so those are sample offsets, not seconds.
+    """
+    import numpy as np
+
+    if not audios:
+        return []
+    bounds = np.cumsum([0] + [len(audio) for audio in audios]) / sample_rate
+    clips = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        for clip_start in np.arange(start, end, CLIP_SEC):
+            clip_end = min(clip_start + CLIP_SEC, end)
+            clips.append({"start": int(round(clip_start * sample_rate)),
+                          "end": int(round(clip_end * sample_rate))})
+    # Greedy, text tokens only; the batched pipeline never conditions on
+    # previous text and only decodes at the first temperature (0.0)
+    segments, _ = batched.transcribe(np.concatenate(audios), clip_timestamps=clips,
+                                     batch_size=batch_size, language="en", beam_size=1,
+                                     without_timestamps=True)
+    texts = [[] for _ in audios]
+    for segment in segments:
+        midpoint = (segment.start + segment.end) / 2  # start times are rounded to ms
+        texts[bisect.bisect_right(bounds, midpoint) - 1].append(segment.text)
+    return ["".join(parts) for parts in texts]
@@ -12,11 +12,13 @@ print("="*60)
 import re
 
 # Look for sequences with numbers and words
-pattern = r'(One|Two|Three|Four|Five|Six|Seven|Eight|Nine|Ten)[.,\s]+(\w+)'
-matches = re.findall(pattern, text, re.IGNORECASE)
+from itertools import islice
+NUMBER_SEQ_RE = re.compile(r'(One|Two|Three|Four|Five|Six|Seven|Eight|Nine|Ten)[.,\s]+(\w+)', re.IGNORECASE)
 
 print("\nNumber word sequences found:")
-for num, word in matches[:20]:  # First 20
+# Stream matches and stop scanning once the first 20 are printed
+for m in islice(NUMBER_SEQ_RE.finditer(text), 20):
+    num, word = m.groups()
     print(f"  {num} -> {word}")
 
 # Specific analysis of the Sigmoid sequence
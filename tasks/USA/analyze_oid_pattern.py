@@ -7,7 +7,8 @@ with open("first_10min_transcript.txt", "r") as f:
 
 # Find all -oid words
 import re
-oid_words = re.findall(r'\b(\w*oid)\b', text, re.IGNORECASE)
+OID_RE = re.compile(r'\b(\w*oid)\b', re.IGNORECASE)
+oid_words = OID_RE.findall(text)
 
 print("="*60)
 print("Analyzing -oid words pattern")
@@ -41,10 +42,21 @@ print("Looking for position clues...")
 print("="*60)
 
 # Pattern: number word followed by -oid word
+# One alternation scanned once instead of a fresh regex and full pass per
+# number; the -oid word sits in a lookahead so later number words stay
+# matchable, and next_start keeps each number's matches non-overlapping
 number_words = ['one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine', 'ten']
+NUMS = re.compile('(' + '|'.join(number_words) + r')(?=.*?(\w*oid))', re.IGNORECASE)
+by_number = {}
+next_start = {}
+for m in NUMS.finditer(text):
+    num_word = m.group(1).lower()
+    if m.start() < next_start.get(num_word, 0):
+        continue
+    by_number.setdefault(num_word, []).append(m.group(2))
+    next_start[num_word] = m.end(2)
 for i, num_word in enumerate(number_words, 1):
-    pattern = f'{num_word}.*?(\\w*oid)'
-    matches = re.findall(pattern, text, re.IGNORECASE)
+    matches = by_number.get(num_word)
     if matches:
         print(f"Position {i} ({num_word}): {matches}")
 
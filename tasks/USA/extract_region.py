@@ -1,24 +1,17 @@
 #!/usr/bin/env python3
 """Extract a specific region from audio for targeted transcription"""
 
-from pydub import AudioSegment
 import sys
+from _audio_utils import extract_to_file, get_duration
 
 def extract_region(input_file, output_file, start_min, end_min):
     """Extract a region from the audio"""
-    print(f"Loading audio file: {input_file}")
-    audio = AudioSegment.from_mp3(input_file)
+    print(f"Extracting from audio file: {input_file}")
 
-    # Convert to milliseconds
-    start_ms = int(start_min * 60 * 1000)
-    end_ms = int(end_min * 60 * 1000)
+    # Seek before -i (fast keyframe seek) and copy MP3 frames without decoding
+    extract_to_file(input_file, start_min * 60, (end_min - start_min) * 60, output_file)
+    duration_min = get_duration(output_file) / 60
 
-    # Extract region
-    region = audio[start_ms:end_ms]
-    duration_min = len(region) / 1000 / 60
-
-    # Export
-    region.export(output_file, format="mp3")
     print(f"Extracted region from {start_min:.1f} to {end_min:.1f} minutes")
     print(f"Duration: {duration_min:.2f} minutes")
     print(f"Saved to: {output_file}")
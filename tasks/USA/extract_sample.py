@@ -1,29 +1,21 @@
 #!/usr/bin/env python3
 """Extract a sample from the audio file for testing"""
 
-from pydub import AudioSegment
 import sys
+from _audio_utils import extract_to_file, get_duration
 
 def extract_sample(input_file, output_file, start_min=0, duration_min=5):
     """Extract a sample from the audio"""
-    print(f"Loading audio file: {input_file}")
-    audio = AudioSegment.from_mp3(input_file)
-
-    total_duration = len(audio) / 1000 / 60
+    print(f"Probing audio file: {input_file}")
+    total_duration = get_duration(input_file) / 60
     print(f"Total duration: {total_duration:.2f} minutes")
 
-    # Convert to milliseconds
-    start_ms = start_min * 60 * 1000
-    duration_ms = duration_min * 60 * 1000
-
-    # Extract sample
-    sample = audio[start_ms:start_ms + duration_ms]
+    # Seek before -i (fast keyframe seek) and copy MP3 frames without decoding
+    extract_to_file(input_file, start_min * 60, duration_min * 60, output_file)
 
-    # Export
-    sample.export(output_file, format="mp3")
     print(f"Extracted {duration_min} minutes starting at {start_min} minutes")
     print(f"Saved to: {output_file}")
-    print(f"Sample size: {len(sample) / 1000 / 60:.2f} minutes")
+    print(f"Sample size: {get_duration(output_file) / 60:.2f} minutes")
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
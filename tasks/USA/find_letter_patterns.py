@@ -5,46 +5,66 @@ Since the hint says "use the power of programming" and shows "I-A-S-S",
 maybe the letters are spelled out directly throughout the audio
 """
 
-import whisper
-import subprocess
+from faster_whisper import BatchedInferencePipeline
 import re
-
-def get_audio_duration(audio_file):
-    cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-           '-of', 'default=noprint_wrappers=1:nokey=1', audio_file]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    return float(result.stdout.strip())
-
-def extract_chunk_ffmpeg(audio_file, start_sec, duration_sec, output_file):
-    cmd = ['ffmpeg', '-y', '-v', 'error', '-ss', str(start_sec),
-           '-i', audio_file, '-t', str(duration_sec),
-           '-acodec', 'libmp3lame', '-q:a', '4', output_file]
-    subprocess.run(cmd, check=True)
+from _audio_utils import (default_model_size, extract_to_pcm, get_duration, get_model, speech_only,
+                          transcribe_clips, use_torch_features)
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional; fall back to the NATO regex
+    ahocorasick = None
+
+# Pattern 1: Single capital letters separated by dashes or spaces
+SEQUENCE_RE = re.compile(r'\b([A-Z])[-\s]([A-Z])[-\s]([A-Z])', re.IGNORECASE)
+
+# Pattern 2: "letter X is Y" or similar
+LETTER_IS_RE = re.compile(r'letter[s]?\s+.*?is\s+([A-Z])')
+
+# Pattern 3: NATO phonetic alphabet, as one alternation scanned in a single pass
+NATO = ['Alpha', 'Bravo', 'Charlie', 'Delta', 'Echo', 'Foxtrot',
+        'Golf', 'Hotel', 'India', 'Juliet', 'Kilo', 'Lima', 'Mike',
+        'November', 'Oscar', 'Papa', 'Quebec', 'Romeo', 'Sierra',
+        'Tango', 'Uniform', 'Victor', 'Whiskey', 'X-ray', 'Yankee', 'Zulu']
+NATO_BY_LOWER = {phonetic.lower(): phonetic for phonetic in NATO}
+NATO_RE = re.compile(r'\b(' + '|'.join(map(re.escape, NATO)) + r')\b', re.IGNORECASE)
+
+if ahocorasick is not None:
+    # One automaton finds all 26 words in a single pass over the lowercased text
+    NATO_AUTOMATON = ahocorasick.Automaton()
+    for phonetic in NATO:
+        NATO_AUTOMATON.add_word(phonetic.lower(), phonetic)
+    NATO_AUTOMATON.make_automaton()
+
+def _is_word_char(text, idx):
+    return 0 <= idx < len(text) and (text[idx].isalnum() or text[idx] == '_')
+
+def find_nato(text):
+    """Yield (phonetic, start) for every whole-word NATO phonetic in text"""
+    if ahocorasick is None:
+        for match in NATO_RE.finditer(text):
+            yield NATO_BY_LOWER[match.group(1).lower()], match.start()
+        return
+    text_lower = text.lower()
+    for end_idx, phonetic in NATO_AUTOMATON.iter(text_lower):
+        start = end_idx - len(phonetic) + 1
+        if not _is_word_char(text_lower, start - 1) and not _is_word_char(text_lower, end_idx + 1):
+            yield phonetic, start
 
 def find_letter_sequences(text):
     """Find sequences that look like spelled-out letters"""
-    # Pattern 1: Single capital letters separated by dashes or spaces
-    pattern1 = r'\b([A-Z])[-\s]([A-Z])[-\s]([A-Z])'
-
-    # Pattern 2: "letter X is Y" or similar
-    pattern2 = r'letter[s]?\s+.*?is\s+([A-Z])'
-
-    # Pattern 3: NATO phonetic alphabet
-    nato = ['Alpha', 'Bravo', 'Charlie', 'Delta', 'Echo', 'Foxtrot',
-            'Golf', 'Hotel', 'India', 'Juliet', 'Kilo', 'Lima', 'Mike',
-            'November', 'Oscar', 'Papa', 'Quebec', 'Romeo', 'Sierra',
-            'Tango', 'Uniform', 'Victor', 'Whiskey', 'X-ray', 'Yankee', 'Zulu']
-
     results = []
 
     # Find dash/space separated letters
-    for match in re.finditer(pattern1, text, re.IGNORECASE):
+    for match in SEQUENCE_RE.finditer(text):
         results.append(('sequence', match.group(0), match.start()))
 
-    # Find NATO phonetics
-    for phonetic in nato:
-        if phonetic.lower() in text.lower():
-            results.append(('nato', phonetic, text.lower().find(phonetic.lower())))
+    # Find NATO phonetics (first mention of each)
+    seen = set()
+    for phonetic, start in find_nato(text):
+        if phonetic not in seen:
+            seen.add(phonetic)
+            results.append(('nato', phonetic, start))
 
     return results
 
@@ -52,51 +72,85 @@ def find_letter_sequences(text):
 print("Quick scanning for letter patterns in the audio...")
 print("This will take a while but is FREE!\n")
 
-model = whisper.load_model("base")
-
 audio_file = "audio_task_43.mp3"
-duration = get_audio_duration(audio_file)
+duration = get_duration(audio_file)
 
 # Scan more frequently (every minute, 30sec chunks)
 scan_interval = 60  # every minute
-chunk_duration = 30
+chunk_duration = 30  # one Whisper window, so each chunk is a single clip in the batch
 
 letter_findings = []
 
-import tempfile
 import os
-
-for start in range(0, int(duration), scan_interval):
-    min_mark = start / 60
-    print(f"Scanning {min_mark:.1f} min...", end=' ', flush=True)
-
-    with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as f:
-        temp_path = f.name
-
-    try:
-        extract_chunk_ffmpeg(audio_file, start, chunk_duration, temp_path)
-        result = model.transcribe(temp_path)
-        text = result["text"]
-
-        # Look for letter patterns
-        patterns = find_letter_sequences(text)
-
-        if patterns or any(word in text for word in ['letter', 'keyword', 'Alpha', 'Bravo']):
-            print(f"✓ INTERESTING!")
-            print(f"  Text: {text[:150]}...")
-            letter_findings.append({
-                'time': start,
-                'text': text,
-                'patterns': patterns
-            })
-        else:
-            print("- ")
-
-    except Exception as e:
-        print(f"Error: {e}")
-    finally:
-        if os.path.exists(temp_path):
-            os.unlink(temp_path)
+import sys
+import logging
+import logging.handlers
+from concurrent.futures import ThreadPoolExecutor
+
+SAMPLE_RATE = 16000
+BATCH_SIZE = 16
+
+# Per-chunk scan lines are buffered and written once per batch (errors flush
+# immediately); all of them are emitted from the main thread
+scan_output = logging.handlers.MemoryHandler(capacity=4 * BATCH_SIZE, flushLevel=logging.ERROR,
+                                             target=logging.StreamHandler(sys.stdout))
+log = logging.getLogger("find_letter_patterns")
+log.addHandler(scan_output)
+log.setLevel(logging.INFO)
+log.propagate = False
+
+batched = BatchedInferencePipeline(model=use_torch_features(get_model(default_model_size())))
+
+def extract(start):
+    """Decode the chunk at start seconds to 16 kHz mono float32, keeping only speech"""
+    return speech_only(extract_to_pcm(audio_file, start, chunk_duration, SAMPLE_RATE))
+
+def report(start, text):
+    # Look for letter patterns
+    patterns = find_letter_sequences(text)
+
+    if patterns or any(word in text for word in ['letter', 'keyword', 'Alpha', 'Bravo']):
+        log.info(f"Scanning {start / 60:.1f} min... ✓ INTERESTING!\n  Text: {text[:150]}...")
+        letter_findings.append({
+            'time': start,
+            'text': text,
+            'patterns': patterns
+        })
+    else:
+        log.info(f"Scanning {start / 60:.1f} min... - ")
+
+starts = list(range(0, int(duration), scan_interval))
+groups = [starts[i:i + BATCH_SIZE] for i in range(0, len(starts), BATCH_SIZE)]
+
+# ffmpeg extraction of the next group runs on the pool while the current group is transcribed
+with ThreadPoolExecutor(max_workers=min(BATCH_SIZE, os.cpu_count())) as executor:
+    pending = [executor.submit(extract, start) for start in groups[0]] if groups else []
+    for group_idx, group in enumerate(groups):
+        chunks = []
+        for start, future in zip(group, pending):
+            try:
+                audio = future.result()
+            except Exception as e:
+                log.error(f"Scanning {start / 60:.1f} min... Error: {e}")
+                continue
+            if audio is None:
+                log.info(f"Scanning {start / 60:.1f} min... - (no speech)")
+                continue
+            chunks.append((start, audio))
+        if group_idx + 1 < len(groups):
+            pending = [executor.submit(extract, start) for start in groups[group_idx + 1]]
+        if not chunks:
+            scan_output.flush()
+            continue
+
+        try:
+            texts = transcribe_clips(batched, [audio for _, audio in chunks], batch_size=BATCH_SIZE)
+        except Exception as e:
+            log.error(f"Error transcribing batch at {group[0] / 60:.1f} min: {e}")
+            continue
+        for (start, _), text in zip(chunks, texts):
+            report(start, text)
+        scan_output.flush()
 
 print(f"\n{'='*60}")
 print(f"Found {len(letter_findings)} interesting segments")
@@ -1,80 +1,147 @@
 #!/usr/bin/env python3
 """
-Sample the entire audio at regular intervals to find keyword letters efficiently.
+Sample the entire audio adaptively to find keyword letters efficiently.
 Total duration: 7h50min = 470 minutes
-Strategy: Sample every 50 minutes throughout the audio
+Strategy: Coarse sweep until a sample hits, then bisect both edges of the
+keyword region (the letters are placed consecutively)
 """
 
-import whisper
-import subprocess
-import os
+from faster_whisper import BatchedInferencePipeline
+import hashlib
+import json
+import math
 import re
+from pathlib import Path
+from _audio_utils import (default_model_size, extract_many_to_pcm, get_duration, get_model, speech_only,
+                          transcribe_clips, use_torch_features)
 
-def extract_segment(start_min, duration_min=2):
-    """Extract a short segment from the audio"""
-    start_sec = start_min * 60
-    duration_sec = duration_min * 60
-    output = f"sample_{start_min}min.mp3"
+SAMPLE_RATE = 16000
+BATCH_SIZE = 16
+SAMPLE_MIN = 2         # length of each probe
+COARSE_PROBES = 4      # at least this many points in the first sweep
+MAX_SPACING_MIN = 50   # finest sweep spacing, as in the old fixed 50 min grid
+RESOLUTION_MIN = 5     # stop bisecting an edge once it is known to this precision
 
-    if os.path.exists(output):
-        print(f"  Using existing {output}")
-        return output
+# Transcripts from earlier runs, keyed by "<sha1 of first MB>:<start min>:<duration min>"
+CACHE = Path("transcripts.json")
 
-    print(f"  Extracting {duration_min} min sample at {start_min} min mark...")
-    cmd = ['ffmpeg', '-y', '-v', 'error', '-ss', str(start_sec),
-           '-i', 'audio_task_43.mp3', '-t', str(duration_sec),
-           '-acodec', 'libmp3lame', '-q:a', '4', output]
-    subprocess.run(cmd, check=True)
-    return output
+def extract_segments(starts_min, duration_min=2):
+    """Decode several segments of the audio to mono float32 PCM with a single ffmpeg process"""
+    for start_min in starts_min:
+        print(f"  Extracting {duration_min} min sample at {start_min} min mark...")
+    return extract_many_to_pcm('audio_task_43.mp3', [start_min * 60 for start_min in starts_min],
+                               duration_min * 60, SAMPLE_RATE)
+
+KEYWORD_PAT = re.compile(r"[Tt]he\s+(\d+)(?:st|nd|rd|th)?\s+letter\s+(?:in|of)\s+(?:the\s+)?keyword\s+is\s+([A-Za-z])[,\s]+([A-Za-z]+)")
 
 def find_keywords(text):
     """Search for keyword patterns in text"""
-    pattern = r"[Tt]he\s+(\d+)(?:st|nd|rd|th)?\s+letter\s+(?:in|of)\s+(?:the\s+)?keyword\s+is\s+([A-Za-z])[,\s]+([A-Za-z]+)"
-    matches = re.findall(pattern, text)
-    return matches
+    return KEYWORD_PAT.findall(text)
 
 def main():
     print("="*70)
     print("Sampling Entire Audio for Keyword Letters")
     print("="*70)
-    print("Strategy: Sample 2 minutes at regular intervals throughout 7h50min audio")
+    print("Strategy: Sample 2 minutes adaptively (coarse sweep, then bisect the keyword region)")
     print()
 
     # Load Whisper model once
     print("Loading Whisper model...")
-    model = whisper.load_model("base")
+    batched = BatchedInferencePipeline(model=use_torch_features(get_model(default_model_size())))
 
-    # Sample points: every 50 minutes from 50 to 450
-    sample_points = [50, 100, 150, 200, 250, 300, 350, 400, 450]
+    total_min = get_duration('audio_task_43.mp3') / 60
+    last_start = total_min - SAMPLE_MIN
 
     all_keywords = {}
-
-    for sample_min in sample_points:
+    hits = {}  # sample start (min) -> whether it contained keyword letters
+
+    # The first MB is enough to tell different audio files apart
+    with open('audio_task_43.mp3', 'rb') as f:
+        audio_sha = hashlib.sha1(f.read(1 << 20)).hexdigest()[:8]
+    cache = json.loads(CACHE.read_text()) if CACHE.exists() else {}
+
+    def cache_key(sample_min):
+        """Transcript cache key of the sample starting at sample_min"""
+        return f"{audio_sha}:{sample_min}:{SAMPLE_MIN}"
+
+    def probe(sample_points):
+        """Decode a round of samples with one ffmpeg call, transcribe them in one batched call and record hits"""
+        sample_points = [t for t in sample_points if t not in hits]
+        if not sample_points:
+            return
+        new_points = [t for t in sample_points if cache_key(t) not in cache]
+        if new_points:
+            audios = [speech_only(audio) for audio in extract_segments(new_points, duration_min=SAMPLE_MIN)]
+            voiced = [audio for audio in audios if audio is not None]
+            print(f"\nTranscribing {len(voiced)} of {len(new_points)} samples (rest had no speech) "
+                  f"in batches of {BATCH_SIZE} clips...")
+            voiced_transcripts = iter(transcribe_clips(batched, voiced, batch_size=BATCH_SIZE))
+            for sample_min, audio in zip(new_points, audios):
+                cache[cache_key(sample_min)] = next(voiced_transcripts) if audio is not None else ""
+            CACHE.write_text(json.dumps(cache))
+        if len(new_points) < len(sample_points):
+            print(f"\nReusing {len(sample_points) - len(new_points)} cached transcript(s) from {CACHE}")
+        transcripts = [cache[cache_key(t)] for t in sample_points]
+
+        for sample_min, transcript in zip(sample_points, transcripts):
+            print(f"\n{'='*70}")
+            print(f"Sample at {sample_min:.1f} minutes ({int(sample_min)//60}h {sample_min%60:.1f}min)")
+            print(f"{'='*70}")
+
+            # Search for keywords
+            matches = find_keywords(transcript)
+            hits[sample_min] = bool(matches)
+
+            if matches:
+                print(f"  ✓ FOUND {len(matches)} keyword letter(s)!")
+                for pos, letter, phonetic in matches:
+                    print(f"    Position {pos}: {letter.upper()} ({phonetic})")
+                    all_keywords[int(pos)] = letter.upper()
+            else:
+                print(f"  - No keyword letters found at {sample_min:.1f} min")
+                # Show snippet of what was transcribed
+                snippet = transcript[:150] + "..." if len(transcript) > 150 else transcript
+                print(f"  Content: {snippet}")
+
+    # Round 1: coarse sweep over a nested grid, doubling the density until some
+    # sample hits. Points are multiples of the finest spacing, taken every
+    # `stride` steps; halving the stride only adds the previous round's midpoints.
+    n_grid = math.ceil(last_start / MAX_SPACING_MIN)
+    spacing = last_start / n_grid
+    stride = 1
+    while n_grid // (stride * 2) >= COARSE_PROBES:
+        stride *= 2
+    while True:
+        probe([round(k * spacing, 1) for k in range(stride, n_grid + 1, stride)])
+        if any(hits.values()) or stride == 1:
+            break
+        stride //= 2
+
+    # Round 2+: bisect between the outermost hits and their missing neighbours
+    if any(hits.values()):
+        def bracket():
+            times = sorted(hits)
+            hit_times = [t for t in times if hits[t]]
+            left_miss = max((t for t in times if t < hit_times[0]), default=None)
+            right_miss = min((t for t in times if t > hit_times[-1]), default=None)
+            return left_miss, hit_times[0], hit_times[-1], right_miss
+
+        while True:
+            left_miss, first_hit, last_hit, right_miss = bracket()
+            round_points = []
+            if left_miss is not None and first_hit - left_miss > RESOLUTION_MIN:
+                round_points.append(round((left_miss + first_hit) / 2, 1))
+            if right_miss is not None and right_miss - last_hit > RESOLUTION_MIN:
+                round_points.append(round((last_hit + right_miss) / 2, 1))
+            if not round_points:
+                break
+            probe(round_points)
+
+        left_miss, first_hit, last_hit, right_miss = bracket()
         print(f"\n{'='*70}")
-        print(f"Sample at {sample_min} minutes ({sample_min//60}h {sample_min%60}min)")
-        print(f"{'='*70}")
-
-        # Extract segment
-        segment_file = extract_segment(sample_min, duration_min=2)
-
-        # Transcribe
-        print(f"  Transcribing...")
-        result = model.transcribe(segment_file, verbose=False)
-        transcript = result["text"]
-
-        # Search for keywords
-        matches = find_keywords(transcript)
-
-        if matches:
-            print(f"  ✓ FOUND {len(matches)} keyword letter(s)!")
-            for pos, letter, phonetic in matches:
-                print(f"    Position {pos}: {letter.upper()} ({phonetic})")
-                all_keywords[int(pos)] = letter.upper()
-        else:
-            print(f"  - No keyword letters found at {sample_min} min")
-            # Show snippet of what was transcribed
-            snippet = transcript[:150] + "..." if len(transcript) > 150 else transcript
-            print(f"  Content: {snippet}")
+        print(f"Keyword region: {left_miss if left_miss is not None else 0:.1f} - "
+              f"{(right_miss if right_miss is not None else last_start) + SAMPLE_MIN:.1f} min "
+              f"({len(hits)} samples transcribed)")
 
     # Summary
     print(f"\n{'='*70}")
@@ -91,9 +158,7 @@ def main():
 
         # Try to build keyword
         max_pos = max(all_keywords.keys())
-        keyword = ""
-        for i in range(1, max_pos + 1):
-            keyword += all_keywords.get(i, "_")
+        keyword = "".join(all_keywords.get(i, "_") for i in range(1, max_pos + 1))
 
         print(f"\n🚩 KEYWORD SO FAR: {keyword}")
         missing_positions = [i for i in range(1, max_pos + 1) if i not in all_keywords]
@@ -4,78 +4,86 @@ Smart search strategy: Sample different parts of the audio to find where keyword
 then only transcribe that section.
 """
 
-from pydub import AudioSegment
 from openai import OpenAI
 import os
+import re
+import sys
 import tempfile
+from _audio_utils import extract_to_file, get_duration, load_openai_key
 
-def quick_sample_search(audio_file, api_key, sample_points=10, sample_duration_sec=30):
+# "letter in keyword" / "letter of the keyword", in any case
+KEYWORD_PHRASE_RE = re.compile(r"letter (?:in|of the) keyword", re.IGNORECASE)
+
+def quick_sample_search(audio_file, api_key, sample_points=10, sample_duration_sec=30, early_exit_hits=None):
     """
     Take small samples throughout the audio to find where keywords appear.
+    With early_exit_hits set, stop sampling once that many samples contain keywords.
     Cost: ~$0.30 for 10 samples of 30 seconds each = 5 minutes total
     """
     client = OpenAI(api_key=api_key)
 
-    print("Loading audio file...", flush=True)
-    audio = AudioSegment.from_mp3(audio_file)
-    total_duration_min = len(audio) / 1000 / 60
+    # The duration comes from the file headers (mutagen, or ffprobe as a fallback), without decoding the audio
+    print("Getting audio duration...", flush=True)
+    total_duration_sec = get_duration(audio_file)
+    total_duration_min = total_duration_sec / 60
 
     print(f"Audio duration: {total_duration_min:.2f} minutes")
     print(f"Taking {sample_points} samples of {sample_duration_sec} seconds each")
     print(f"Estimated cost: ~${(sample_points * sample_duration_sec / 60) * 0.006:.3f}")
 
     # Take evenly spaced samples
-    interval = len(audio) // sample_points
-    sample_duration_ms = sample_duration_sec * 1000
+    interval_sec = total_duration_sec / sample_points
 
     results = []
 
-    for i in range(sample_points):
-        start_ms = i * interval
-        start_min = start_ms / 1000 / 60
-
-        print(f"\nSample {i+1}/{sample_points} at {start_min:.1f} min...")
-
-        # Extract sample
-        sample = audio[start_ms:start_ms + sample_duration_ms]
-
-        # Export to temp file
-        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as temp_file:
-            sample.export(temp_file.name, format="mp3")
-            temp_path = temp_file.name
-
-        try:
-            # Transcribe
-            with open(temp_path, "rb") as audio_file_obj:
-                transcript = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file_obj,
-                    response_format="text"
-                )
-
-            # Check for keyword pattern
-            if "letter in keyword" in transcript.lower():
-                print(f"  ✓ FOUND KEYWORD PATTERN!")
-                print(f"  Transcript: {transcript[:200]}...")
-                results.append({
-                    "sample": i+1,
-                    "start_min": start_min,
-                    "has_keywords": True,
-                    "transcript": transcript
-                })
-            else:
-                print(f"  - No keywords found")
-                results.append({
-                    "sample": i+1,
-                    "start_min": start_min,
-                    "has_keywords": False
-                })
-
-        except Exception as e:
-            print(f"  Error: {e}")
-
-        finally:
-            os.unlink(temp_path)
+    # One temp file, overwritten by each sample in turn
+    fd, temp_path = tempfile.mkstemp(suffix=".mp3")
+    os.close(fd)
+    try:
+        for i in range(sample_points):
+            start_sec = i * interval_sec
+            start_min = start_sec / 60
+
+            print(f"\nSample {i+1}/{sample_points} at {start_min:.1f} min...")
+
+            try:
+                # Extract sample with ffmpeg (-y overwrites the previous sample)
+                extract_to_file(audio_file, start_sec, sample_duration_sec, temp_path)
+
+                # Transcribe
+                with open(temp_path, "rb") as audio_file_obj:
+                    transcript = client.audio.transcriptions.create(
+                        model="whisper-1",
+                        file=audio_file_obj,
+                        response_format="text"
+                    )
+
+                # Check for keyword pattern
+                if KEYWORD_PHRASE_RE.search(transcript):
+                    print(f"  ✓ FOUND KEYWORD PATTERN!")
+                    print(f"  Transcript: {transcript[:200]}...")
+                    results.append({
+                        "sample": i+1,
+                        "start_min": start_min,
+                        "has_keywords": True,
+                        "transcript": transcript
+                    })
+                else:
+                    print(f"  - No keywords found")
+                    results.append({
+                        "sample": i+1,
+                        "start_min": start_min,
+                        "has_keywords": False
+                    })
+
+            except Exception as e:
+                print(f"  Error: {e}")
+
+            if early_exit_hits and sum(r["has_keywords"] for r in results) >= early_exit_hits:
+                print(f"\nFound {early_exit_hits} keyword samples, skipping the remaining {sample_points - i - 1}")
+                break
+    finally:
+        os.unlink(temp_path)
 
     # Find the region with keywords
     keyword_samples = [r for r in results if r.get("has_keywords")]
@@ -108,21 +116,17 @@ def quick_sample_search(audio_file, api_key, sample_points=10, sample_duration_s
         return None, None
 
 if __name__ == "__main__":
-    api_key = os.environ.get("OPENAI_API_KEY")
+    api_key = load_openai_key()
     if not api_key:
-        # Try to read from config
-        try:
-            with open(os.path.expanduser("~/.config/openai/api_key")) as f:
-                api_key = f.read().strip()
-        except:
-            print("Error: No OpenAI API key found")
-            exit(1)
+        print("Error: No OpenAI API key found")
+        exit(1)
 
     region_start, region_end = quick_sample_search(
         "audio_task_43.mp3",
         api_key,
         sample_points=10,  # Adjust this
-        sample_duration_sec=30
+        sample_duration_sec=30,
+        early_exit_hits=2 if "--early-exit" in sys.argv else None
     )
 
     if region_start is not None:
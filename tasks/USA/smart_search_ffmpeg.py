@@ -5,43 +5,28 @@ Smart search using ffmpeg to extract samples directly without loading entire fil
 
 from openai import OpenAI
 import os
-import subprocess
+import re
+import sys
 import tempfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from _audio_utils import extract_to_file, get_duration, load_openai_key
 
-def get_audio_duration(audio_file):
-    """Get duration of audio file using ffprobe"""
-    cmd = [
-        'ffprobe', '-v', 'error',
-        '-show_entries', 'format=duration',
-        '-of', 'default=noprint_wrappers=1:nokey=1',
-        audio_file
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    return float(result.stdout.strip())
-
-def extract_sample_ffmpeg(audio_file, start_sec, duration_sec, output_file):
-    """Extract a sample using ffmpeg directly"""
-    cmd = [
-        'ffmpeg', '-y', '-v', 'error',
-        '-ss', str(start_sec),
-        '-i', audio_file,
-        '-t', str(duration_sec),
-        '-acodec', 'libmp3lame',
-        '-q:a', '4',
-        output_file
-    ]
-    subprocess.run(cmd, check=True)
-
-def quick_sample_search(audio_file, api_key, sample_points=10, sample_duration_sec=30):
+# "letter in keyword" / "letter of the keyword", in any case
+KEYWORD_PHRASE_RE = re.compile(r"letter (?:in|of the) keyword", re.IGNORECASE)
+
+def quick_sample_search(audio_file, api_key, sample_points=10, sample_duration_sec=30, early_exit_hits=None,
+                        max_in_flight=4):
     """
     Take small samples throughout the audio to find where keywords appear.
     Uses ffmpeg to extract samples directly without loading full file.
+    With early_exit_hits set, no further samples are sent once that many
+    samples contain keywords (results of those already in flight are kept).
     Cost: ~$0.30 for 10 samples of 30 seconds each = 5 minutes total
     """
     client = OpenAI(api_key=api_key)
 
     print("Getting audio duration...", flush=True)
-    total_duration_sec = get_audio_duration(audio_file)
+    total_duration_sec = get_duration(audio_file)
     total_duration_min = total_duration_sec / 60
 
     print(f"Audio duration: {total_duration_min:.2f} minutes ({total_duration_sec:.1f} seconds)", flush=True)
@@ -51,58 +36,81 @@ def quick_sample_search(audio_file, api_key, sample_points=10, sample_duration_s
     # Take evenly spaced samples
     interval_sec = total_duration_sec / sample_points
 
-    results = []
-
-    for i in range(sample_points):
-        start_sec = i * interval_sec
-        start_min = start_sec / 60
-
-        print(f"\nSample {i+1}/{sample_points} at {start_min:.1f} min ({start_sec:.0f} sec)...", flush=True)
-
-        # Extract sample with ffmpeg
+    def work(i, start_sec):
+        """Extract one sample and transcribe it; runs on a worker thread"""
         with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as temp_file:
             temp_path = temp_file.name
-
         try:
-            print(f"  Extracting sample...", flush=True)
-            extract_sample_ffmpeg(audio_file, start_sec, sample_duration_sec, temp_path)
-
-            print(f"  Transcribing with OpenAI...", flush=True)
-            # Transcribe
+            extract_to_file(audio_file, start_sec, sample_duration_sec, temp_path)
             with open(temp_path, "rb") as audio_file_obj:
-                transcript = client.audio.transcriptions.create(
+                return client.audio.transcriptions.create(
                     model="whisper-1",
                     file=audio_file_obj,
                     response_format="text"
                 )
-
-            # Check for keyword pattern
-            if "letter in keyword" in transcript.lower() or "letter of the keyword" in transcript.lower():
-                print(f"  ✓ FOUND KEYWORD PATTERN!", flush=True)
-                print(f"  Transcript snippet: {transcript[:200]}...", flush=True)
-                results.append({
-                    "sample": i+1,
-                    "start_min": start_min,
-                    "start_sec": start_sec,
-                    "has_keywords": True,
-                    "transcript": transcript
-                })
-            else:
-                print(f"  - No keywords found", flush=True)
-                results.append({
-                    "sample": i+1,
-                    "start_min": start_min,
-                    "start_sec": start_sec,
-                    "has_keywords": False
-                })
-
-        except Exception as e:
-            print(f"  Error: {e}", flush=True)
-
         finally:
             if os.path.exists(temp_path):
                 os.unlink(temp_path)
 
+    results = []
+
+    # Extraction (local CPU/disk) and upload/transcription (network) of
+    # different samples overlap; output is printed from this thread only.
+    # Samples are submitted lazily, at most max_in_flight at a time, so an
+    # early exit skips every sample not yet sent; those already in flight are
+    # billed anyway, so their results are kept.
+    print(f"\nExtracting and transcribing {sample_points} samples, {max_in_flight} at a time...", flush=True)
+    pending = {}
+    next_i = 0
+    stopped = False
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        while pending or (next_i < sample_points and not stopped):
+            while not stopped and next_i < sample_points and len(pending) < max_in_flight:
+                start_sec = next_i * interval_sec
+                pending[executor.submit(work, next_i, start_sec)] = (next_i, start_sec)
+                next_i += 1
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, start_sec = pending.pop(future)
+                start_min = start_sec / 60
+
+                print(f"\nSample {i+1}/{sample_points} at {start_min:.1f} min ({start_sec:.0f} sec)...", flush=True)
+
+                try:
+                    transcript = future.result()
+
+                    # Check for keyword pattern
+                    if KEYWORD_PHRASE_RE.search(transcript):
+                        print(f"  ✓ FOUND KEYWORD PATTERN!", flush=True)
+                        print(f"  Transcript snippet: {transcript[:200]}...", flush=True)
+                        results.append({
+                            "sample": i+1,
+                            "start_min": start_min,
+                            "start_sec": start_sec,
+                            "has_keywords": True,
+                            "transcript": transcript
+                        })
+                    else:
+                        print(f"  - No keywords found", flush=True)
+                        results.append({
+                            "sample": i+1,
+                            "start_min": start_min,
+                            "start_sec": start_sec,
+                            "has_keywords": False
+                        })
+
+                except Exception as e:
+                    print(f"  Error: {e}", flush=True)
+
+            if (not stopped and early_exit_hits
+                    and sum(r["has_keywords"] for r in results) >= early_exit_hits):
+                stopped = True
+                print(f"\nFound {early_exit_hits} keyword samples, skipping the remaining "
+                      f"{sample_points - next_i} sample(s)", flush=True)
+
+    results.sort(key=lambda r: r["sample"])
+
     # Find the region with keywords
     keyword_samples = [r for r in results if r.get("has_keywords")]
 
@@ -143,21 +151,17 @@ def quick_sample_search(audio_file, api_key, sample_points=10, sample_duration_s
         return None, None, []
 
 if __name__ == "__main__":
-    api_key = os.environ.get("OPENAI_API_KEY")
+    api_key = load_openai_key()
     if not api_key:
-        # Try to read from config
-        try:
-            with open(os.path.expanduser("~/.config/openai/api_key")) as f:
-                api_key = f.read().strip()
-        except:
-            print("Error: No OpenAI API key found")
-            exit(1)
+        print("Error: No OpenAI API key found")
+        exit(1)
 
     region_start, region_end, samples = quick_sample_search(
         "audio_task_43.mp3",
         api_key,
         sample_points=10,  # Adjust this
-        sample_duration_sec=30
+        sample_duration_sec=30,
+        early_exit_hits=2 if "--early-exit" in sys.argv else None
     )
 
     if region_start is not None:
@@ -4,36 +4,14 @@ Smart search using LOCAL Whisper (100% FREE!)
 No API calls, no costs, runs on your machine
 """
 
-import whisper
-import subprocess
-import tempfile
-import os
-
-def get_audio_duration(audio_file):
-    """Get duration of audio file using ffprobe"""
-    cmd = [
-        'ffprobe', '-v', 'error',
-        '-show_entries', 'format=duration',
-        '-of', 'default=noprint_wrappers=1:nokey=1',
-        audio_file
-    ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    return float(result.stdout.strip())
-
-def extract_sample_ffmpeg(audio_file, start_sec, duration_sec, output_file):
-    """Extract a sample using ffmpeg directly"""
-    cmd = [
-        'ffmpeg', '-y', '-v', 'error',
-        '-ss', str(start_sec),
-        '-i', audio_file,
-        '-t', str(duration_sec),
-        '-acodec', 'libmp3lame',
-        '-q:a', '4',
-        output_file
-    ]
-    subprocess.run(cmd, check=True)
-
-def quick_sample_search_local(audio_file, sample_points=10, sample_duration_sec=30, model_size="base"):
+import re
+from faster_whisper import BatchedInferencePipeline
+from _audio_utils import cached_extract_many_to_pcm, default_model_size, get_duration, get_model, speech_only, transcribe_clips
+
+# "letter in keyword" / "letter of the keyword", in any case
+KEYWORD_PHRASE_RE = re.compile(r"letter (?:in|of the) keyword", re.IGNORECASE)
+
+def quick_sample_search_local(audio_file, sample_points=10, sample_duration_sec=30, model_size=None):
     """
     Take small samples throughout the audio to find where keywords appear.
     Uses LOCAL Whisper - completely FREE!
@@ -43,12 +21,15 @@ def quick_sample_search_local(audio_file, sample_points=10, sample_duration_sec=
     - base: Good balance (recommended)
     - small: More accurate, slower
     - medium: Very accurate, much slower
+    - large-v3-turbo: default when a GPU is available
     """
-    print(f"Loading Whisper model '{model_size}'... (first time will download ~150MB)", flush=True)
-    model = whisper.load_model(model_size)
+    if model_size is None:
+        model_size = default_model_size()
+    print(f"Loading faster-whisper model '{model_size}'... (first time will download it)", flush=True)
+    batched = BatchedInferencePipeline(model=get_model(model_size))
 
     print("Getting audio duration...", flush=True)
-    total_duration_sec = get_audio_duration(audio_file)
+    total_duration_sec = get_duration(audio_file)
     total_duration_min = total_duration_sec / 60
 
     print(f"Audio duration: {total_duration_min:.2f} minutes ({total_duration_sec:.1f} seconds)", flush=True)
@@ -57,56 +38,59 @@ def quick_sample_search_local(audio_file, sample_points=10, sample_duration_sec=
 
     # Take evenly spaced samples
     interval_sec = total_duration_sec / sample_points
+    starts = [i * interval_sec for i in range(sample_points)]
+
+    # Decode every sample straight to 16 kHz PCM with one ffmpeg process (reusing
+    # samples decoded on earlier runs), keeping only speech
+    print(f"\nExtracting {sample_points} samples...", flush=True)
+    audios = [speech_only(audio) for audio in cached_extract_many_to_pcm(audio_file, starts, sample_duration_sec)]
+
+    # All voiced samples go through the encoder together
+    voiced = [audio for audio in audios if audio is not None]
+    print(f"Transcribing {len(voiced)} samples with local Whisper in one batched pass "
+          f"({sample_points - len(voiced)} without speech skipped)...", flush=True)
+    voiced_transcripts = iter(transcribe_clips(batched, voiced))
 
     results = []
 
-    for i in range(sample_points):
-        start_sec = i * interval_sec
+    for i, (start_sec, audio) in enumerate(zip(starts, audios)):
         start_min = start_sec / 60
 
         print(f"\nSample {i+1}/{sample_points} at {start_min:.1f} min ({start_sec:.0f} sec)...", flush=True)
 
-        # Extract sample with ffmpeg
-        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as temp_file:
-            temp_path = temp_file.name
-
-        try:
-            print(f"  Extracting sample...", flush=True)
-            extract_sample_ffmpeg(audio_file, start_sec, sample_duration_sec, temp_path)
-
-            print(f"  Transcribing with local Whisper...", flush=True)
-            # Transcribe with local Whisper
-            result = model.transcribe(temp_path)
-            transcript = result["text"]
-
-            # Check for keyword pattern
-            if "letter in keyword" in transcript.lower() or "letter of the keyword" in transcript.lower():
-                print(f"  ✓ FOUND KEYWORD PATTERN!", flush=True)
-                print(f"  Transcript snippet: {transcript[:200]}...", flush=True)
-                results.append({
-                    "sample": i+1,
-                    "start_min": start_min,
-                    "start_sec": start_sec,
-                    "has_keywords": True,
-                    "transcript": transcript
-                })
-            else:
-                print(f"  - No keywords found", flush=True)
-                print(f"    (snippet: {transcript[:80]}...)", flush=True)
-                results.append({
-                    "sample": i+1,
-                    "start_min": start_min,
-                    "start_sec": start_sec,
-                    "has_keywords": False,
-                    "transcript": transcript
-                })
-
-        except Exception as e:
-            print(f"  Error: {e}", flush=True)
-
-        finally:
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
+        if audio is None:
+            print(f"  - No speech (silent sample skipped)", flush=True)
+            results.append({
+                "sample": i+1,
+                "start_min": start_min,
+                "start_sec": start_sec,
+                "has_keywords": False,
+                "transcript": "[silent]"
+            })
+            continue
+        transcript = next(voiced_transcripts)
+
+        # Check for keyword pattern
+        if KEYWORD_PHRASE_RE.search(transcript):
+            print(f"  ✓ FOUND KEYWORD PATTERN!", flush=True)
+            print(f"  Transcript snippet: {transcript[:200]}...", flush=True)
+            results.append({
+                "sample": i+1,
+                "start_min": start_min,
+                "start_sec": start_sec,
+                "has_keywords": True,
+                "transcript": transcript
+            })
+        else:
+            print(f"  - No keywords found", flush=True)
+            print(f"    (snippet: {transcript[:80]}...)", flush=True)
+            results.append({
+                "sample": i+1,
+                "start_min": start_min,
+                "start_sec": start_sec,
+                "has_keywords": False,
+                "transcript": transcript
+            })
 
     # Find the region with keywords
     keyword_samples = [r for r in results if r.get("has_keywords")]
@@ -165,7 +149,7 @@ def quick_sample_search_local(audio_file, sample_points=10, sample_duration_sec=
 if __name__ == "__main__":
     import sys
 
-    model_size = "base"  # Options: tiny, base, small, medium
+    model_size = default_model_size()  # Options: tiny, base, small, medium, large-v3-turbo
     if len(sys.argv) > 1:
         model_size = sys.argv[1]
 
@@ -0,0 +1,40 @@
+# pytest tests for the shared audio helpers
+import os, sys
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _audio_utils import CLIP_SEC, transcribe_clips
+
+class StubBatched:
+    """Stands in for BatchedInferencePipeline: slices the audio by clip samples"""
+
+    def transcribe(self, audio, clip_timestamps, sample_rate=16000, **kwargs):
+        self.clips = clip_timestamps
+        segments = []
+        for i, clip in enumerate(clip_timestamps):
+            chunk = audio[clip["start"]:clip["end"]]
+            start = clip["start"] / sample_rate
+            segments.append(SimpleNamespace(start=start, end=start + len(chunk) / sample_rate,
+                                            text=f"<{i}>"))
+        return segments, None
+
+def test_clips_are_integer_sample_offsets():
+    sample_rate = 16000
+    audios = [np.zeros(45 * sample_rate, dtype=np.float32),
+              np.zeros(10 * sample_rate, dtype=np.float32)]
+    batched = StubBatched()
+    texts = transcribe_clips(batched, audios, sample_rate=sample_rate)
+
+    assert all(isinstance(clip["start"], int) and isinstance(clip["end"], int)
+               for clip in batched.clips)
+    assert batched.clips == [
+        {"start": 0, "end": CLIP_SEC * sample_rate},
+        {"start": CLIP_SEC * sample_rate, "end": 45 * sample_rate},
+        {"start": 45 * sample_rate, "end": 55 * sample_rate},
+    ]
+    assert texts == ["<0><1>", "<2>"]
+
+def test_no_audios():
+    assert transcribe_clips(StubBatched(), []) == []
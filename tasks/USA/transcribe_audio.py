@@ -164,15 +164,13 @@ def transcribe_with_google(audio_file, output_file="transcription.txt"):
 
     return "\n".join(transcription)
 
+# Pattern: "The Nth letter in keyword is X, [NATO phonetic]"
+# Examples: "The 1st letter in keyword is A, Alpha."
+KEYWORD_RE = re.compile(r"[Tt]he\s+(\d+)(?:st|nd|rd|th)\s+letter\s+in\s+keyword\s+is\s+([A-Za-z])[,\s]+([A-Za-z]+)")
+
 def parse_keywords(transcription_text, verbose=True):
     """Parse the transcription to find keyword patterns"""
-
-    # Pattern: "The Nth letter in keyword is X, [NATO phonetic]"
-    # Examples: "The 1st letter in keyword is A, Alpha."
-
-    pattern = r"[Tt]he\s+(\d+)(?:st|nd|rd|th)\s+letter\s+in\s+keyword\s+is\s+([A-Za-z])[,\s]+([A-Za-z]+)"
-
-    matches = re.findall(pattern, transcription_text)
+    matches = KEYWORD_RE.findall(transcription_text)
 
     if verbose:
         print(f"\nFound {len(matches)} potential keyword letters:")
@@ -188,12 +186,8 @@ def parse_keywords(transcription_text, verbose=True):
     # Build the keyword
     if keyword_letters:
         max_pos = max(keyword_letters.keys())
-        keyword = ""
-        for i in range(1, max_pos + 1):
-            if i in keyword_letters:
-                keyword += keyword_letters[i][0]
-            else:
-                keyword += "_"  # Missing letter
+        # "_" marks a missing letter
+        keyword = "".join(keyword_letters.get(i, ("_",))[0] for i in range(1, max_pos + 1))
 
         if verbose:
             print(f"\nExtracted keyword: {keyword}")
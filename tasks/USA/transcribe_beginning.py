@@ -5,37 +5,61 @@ Based on the hint "I-A-S-S" with "One, two, three, four",
 all letters might be at the start.
 """
 
-import whisper
-import subprocess
 import os
 import re
+from _audio_utils import MIN_SILENCE_MS, default_model_size, extract_to_file, get_model
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional; fall back to one substring scan per word
+    ahocorasick = None
 
 def extract_audio_segment(input_file, output_file, start_sec=0, duration_sec=600):
-    """Extract audio segment using ffmpeg"""
+    """Extract audio segment using ffmpeg, copying the MP3 frames without re-encoding"""
     print(f"Extracting first {duration_sec/60:.1f} minutes from audio...", flush=True)
-    cmd = [
-        'ffmpeg', '-y', '-v', 'error',
-        '-ss', str(start_sec),
-        '-i', input_file,
-        '-t', str(duration_sec),
-        '-acodec', 'libmp3lame',
-        '-q:a', '4',
-        output_file
-    ]
-    subprocess.run(cmd, check=True)
+    extract_to_file(input_file, start_sec, duration_sec, output_file)
     print(f"Extracted to {output_file}", flush=True)
 
 def transcribe_audio(audio_file, model_size="base"):
-    """Transcribe audio with local Whisper"""
-    print(f"\nLoading Whisper model '{model_size}'...", flush=True)
-    model = whisper.load_model(model_size)
+    """Transcribe audio with local faster-whisper"""
+    print(f"\nLoading faster-whisper model '{model_size}'...", flush=True)
+    model = get_model(model_size)
 
     print(f"Transcribing {audio_file}...", flush=True)
     print("This will take a few minutes...", flush=True)
 
-    result = model.transcribe(audio_file, verbose=True)
-
-    return result["text"]
+    segments, _ = model.transcribe(audio_file, beam_size=1, vad_filter=True,
+                                   vad_parameters=dict(min_silence_duration_ms=MIN_SILENCE_MS))
+
+    # Segments are decoded lazily; print them as they arrive
+    texts = []
+    for segment in segments:
+        print(f"[{segment.start:.2f}s -> {segment.end:.2f}s] {segment.text}", flush=True)
+        texts.append(segment.text)
+    return "".join(texts)
+
+# Pattern 1: "The Nth letter in keyword is X, [phonetic]"
+KEYWORD_RE = re.compile(r"[Tt]he\s+(\d+)(?:st|nd|rd|th)\s+letter\s+(?:in|of)\s+(?:the\s+)?keyword\s+is\s+([A-Za-z])[,\s]+([A-Za-z]+)")
+
+# Pattern 2: spelled-out sequences like "I-A-S-S"
+SPELLED_RE = re.compile(r'\b([A-Z])[-\s]([A-Z])(?:[-\s]([A-Z]))?(?:[-\s]([A-Z]))?(?:[-\s]([A-Z]))?')
+
+# Pattern 3: NATO phonetic alphabet
+NATO_ALPHABET = {
+    'Alpha': 'A', 'Bravo': 'B', 'Charlie': 'C', 'Delta': 'D', 'Echo': 'E',
+    'Foxtrot': 'F', 'Golf': 'G', 'Hotel': 'H', 'India': 'I', 'Juliet': 'J',
+    'Kilo': 'K', 'Lima': 'L', 'Mike': 'M', 'November': 'N', 'Oscar': 'O',
+    'Papa': 'P', 'Quebec': 'Q', 'Romeo': 'R', 'Sierra': 'S', 'Tango': 'T',
+    'Uniform': 'U', 'Victor': 'V', 'Whiskey': 'W', 'Xray': 'X', 'X-ray': 'X',
+    'Yankee': 'Y', 'Zulu': 'Z'
+}
+
+if ahocorasick is not None:
+    # One automaton finds every phonetic word in a single pass over the case-folded text
+    NATO_AUTOMATON = ahocorasick.Automaton()
+    for phonetic, letter in NATO_ALPHABET.items():
+        NATO_AUTOMATON.add_word(phonetic.casefold(), (phonetic, letter))
+    NATO_AUTOMATON.make_automaton()
 
 def find_letter_patterns(text):
     """Find potential keyword letter patterns"""
@@ -44,8 +68,7 @@ def find_letter_patterns(text):
     print(f"{'='*60}\n")
 
     # Pattern 1: "The Nth letter in keyword is X, [phonetic]"
-    pattern1 = r"[Tt]he\s+(\d+)(?:st|nd|rd|th)\s+letter\s+(?:in|of)\s+(?:the\s+)?keyword\s+is\s+([A-Za-z])[,\s]+([A-Za-z]+)"
-    matches1 = re.findall(pattern1, text)
+    matches1 = KEYWORD_RE.findall(text)
 
     if matches1:
         print("✓ Found standard keyword pattern:")
@@ -58,15 +81,12 @@ def find_letter_patterns(text):
         # Build keyword
         if keyword_letters:
             max_pos = max(keyword_letters.keys())
-            keyword = ""
-            for i in range(1, max_pos + 1):
-                keyword += keyword_letters.get(i, "_")
+            keyword = "".join(keyword_letters.get(i, "_") for i in range(1, max_pos + 1))
             print(f"\n🚩 KEYWORD: {keyword}")
             return keyword, keyword_letters
 
     # Pattern 2: Look for spelled-out sequences like "I-A-S-S"
-    pattern2 = r'\b([A-Z])[-\s]([A-Z])(?:[-\s]([A-Z]))?(?:[-\s]([A-Z]))?(?:[-\s]([A-Z]))?'
-    matches2 = re.findall(pattern2, text)
+    matches2 = SPELLED_RE.findall(text)
 
     if matches2:
         print("\n✓ Found spelled-out letter sequences:")
@@ -75,19 +95,13 @@ def find_letter_patterns(text):
             print(f"  {''.join(letters)}")
 
     # Pattern 3: Look for NATO phonetic alphabet
-    nato_alphabet = {
-        'Alpha': 'A', 'Bravo': 'B', 'Charlie': 'C', 'Delta': 'D', 'Echo': 'E',
-        'Foxtrot': 'F', 'Golf': 'G', 'Hotel': 'H', 'India': 'I', 'Juliet': 'J',
-        'Kilo': 'K', 'Lima': 'L', 'Mike': 'M', 'November': 'N', 'Oscar': 'O',
-        'Papa': 'P', 'Quebec': 'Q', 'Romeo': 'R', 'Sierra': 'S', 'Tango': 'T',
-        'Uniform': 'U', 'Victor': 'V', 'Whiskey': 'W', 'Xray': 'X', 'X-ray': 'X',
-        'Yankee': 'Y', 'Zulu': 'Z'
-    }
-
-    nato_found = []
-    for phonetic, letter in nato_alphabet.items():
-        if phonetic.lower() in text.lower():
-            nato_found.append((phonetic, letter))
+    # Case-fold the transcript once instead of once per phonetic word
+    text_folded = text.casefold()
+    if ahocorasick is not None:
+        found = {phonetic for _, (phonetic, _) in NATO_AUTOMATON.iter(text_folded)}
+    else:
+        found = {phonetic for phonetic in NATO_ALPHABET if phonetic.casefold() in text_folded}
+    nato_found = [(phonetic, letter) for phonetic, letter in NATO_ALPHABET.items() if phonetic in found]
 
     if nato_found:
         print(f"\n✓ Found {len(nato_found)} NATO phonetic letters:")
@@ -96,7 +110,7 @@ def find_letter_patterns(text):
 
     # Pattern 4: Look for number-letter mappings (like "one=I, two=A")
     # Check if "one" appears near letters
-    if 'one' in text.lower() and 'two' in text.lower():
+    if 'one' in text_folded and 'two' in text_folded:
         print("\n✓ Found number words (one, two, three, four) - potential number-to-letter mapping")
 
     return None, {}
@@ -117,7 +131,7 @@ def main():
         print(f"Using existing {segment_file}")
 
     # Transcribe
-    transcript = transcribe_audio(segment_file, model_size="base")
+    transcript = transcribe_audio(segment_file, model_size=default_model_size())
 
     # Save full transcription
     print(f"\nSaving full transcription to 'first_10min_transcript.txt'...", flush=True)
@@ -7,25 +7,32 @@ Hints:
 3. Transcribe all chunks and search for keywords
 """
 
-import whisper
-import subprocess
+from faster_whisper import BatchedInferencePipeline
+import bisect
 import os
 import re
-import json
-from pathlib import Path
+import sqlite3
+from _audio_utils import extract_to_pcm, get_model
 
 # Configuration
 AUDIO_FILE = "audio_task_43.mp3"
 CHUNK_DURATION_MIN = 5  # 5-minute chunks
 TOTAL_DURATION_MIN = 470  # 7h50min = 470 minutes
-OUTPUT_DIR = "chunks"
+TRANSCRIPTS_DB = "transcripts.sqlite"
+# Earlier versions kept one chunks/chunk_{index:03d}_{start}min_transcript.txt per chunk
+LEGACY_TRANSCRIPT_DIR = "chunks"
+LEGACY_TRANSCRIPT_RE = re.compile(r"chunk_(\d+)_(\d+)min_transcript\.txt$")
+# VAD-packed <=30s windows encoded per forward pass; a 5-minute chunk fits in one or two batches
+BATCH_SIZE = 16
 
 def create_chunks():
-    """Split audio into time-based chunks"""
-    Path(OUTPUT_DIR).mkdir(exist_ok=True)
+    """Split audio into time-based chunks
 
+    Nothing is written to disk: each chunk's audio is decoded straight to
+    PCM when it is transcribed.
+    """
     print("="*70)
-    print("Creating Audio Chunks")
+    print("Planning Audio Chunks")
     print("="*70)
     print(f"Total duration: {TOTAL_DURATION_MIN} minutes ({TOTAL_DURATION_MIN//60}h {TOTAL_DURATION_MIN%60}min)")
     print(f"Chunk size: {CHUNK_DURATION_MIN} minutes")
@@ -36,61 +43,88 @@ def create_chunks():
     chunks = []
     for i in range(num_chunks):
         start_min = i * CHUNK_DURATION_MIN
-        start_sec = start_min * 60
-        duration_sec = CHUNK_DURATION_MIN * 60
-
-        chunk_file = f"{OUTPUT_DIR}/chunk_{i:03d}_{start_min}min.mp3"
-
-        if os.path.exists(chunk_file):
-            print(f"  ✓ Chunk {i+1}/{num_chunks}: {chunk_file} (exists)")
-        else:
-            print(f"  Creating chunk {i+1}/{num_chunks}: minutes {start_min}-{start_min+CHUNK_DURATION_MIN}...")
-            cmd = [
-                'ffmpeg', '-y', '-v', 'error',
-                '-ss', str(start_sec),
-                '-i', AUDIO_FILE,
-                '-t', str(duration_sec),
-                '-acodec', 'libmp3lame',
-                '-q:a', '4',
-                chunk_file
-            ]
-            subprocess.run(cmd, check=True)
-
         chunks.append({
             'index': i,
-            'file': chunk_file,
             'start_min': start_min,
             'end_min': min(start_min + CHUNK_DURATION_MIN, TOTAL_DURATION_MIN)
         })
 
     return chunks
 
-def transcribe_chunk(model, chunk_info):
-    """Transcribe a single chunk"""
-    chunk_file = chunk_info['file']
-    transcript_file = chunk_file.replace('.mp3', '_transcript.txt')
-
-    # Skip if already transcribed
-    if os.path.exists(transcript_file):
-        with open(transcript_file, 'r') as f:
-            return f.read()
+def open_transcripts(db_path=TRANSCRIPTS_DB):
+    """Open the SQLite store of chunk transcripts, keyed by chunk index; it doubles as the progress record"""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS transcripts "
+        "(idx INTEGER PRIMARY KEY, start_min INTEGER, text TEXT)"
+    )
+    if conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0] == 0:
+        import_legacy_transcripts(conn)
+    return conn
+
+def import_legacy_transcripts(conn, legacy_dir=LEGACY_TRANSCRIPT_DIR):
+    """Copy per-chunk .txt transcripts from earlier runs into the store, so they aren't redone"""
+    if not os.path.isdir(legacy_dir):
+        return
+    rows = []
+    for name in sorted(os.listdir(legacy_dir)):
+        m = LEGACY_TRANSCRIPT_RE.match(name)
+        if m:
+            with open(os.path.join(legacy_dir, name)) as f:
+                rows.append((int(m.group(1)), int(m.group(2)), f.read()))
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO transcripts VALUES (?, ?, ?)", rows)
+    if rows:
+        print(f"Imported {len(rows)} transcript(s) from {legacy_dir}/ into {TRANSCRIPTS_DB}")
+
+def transcribe_chunk(batched, chunk_info, conn):
+    """Transcribe a single chunk
+
+    The chunk is decoded to 16 kHz PCM through an ffmpeg pipe. Silero VAD
+    cuts it on silence and packs the speech into <=30s windows, which go
+    through the encoder BATCH_SIZE at a time.
+    """
+    # Skip if already transcribed (start_min guards against a changed CHUNK_DURATION_MIN)
+    row = conn.execute("SELECT text FROM transcripts WHERE idx = ? AND start_min = ?",
+                       (chunk_info['index'], chunk_info['start_min'])).fetchone()
+    if row is not None:
+        return row[0]
 
     # Transcribe
-    result = model.transcribe(chunk_file, verbose=False)
-    transcript = result["text"]
+    start_sec = chunk_info['start_min'] * 60
+    audio = extract_to_pcm(AUDIO_FILE, start_sec, chunk_info['end_min'] * 60 - start_sec)
+    segments, _ = batched.transcribe(audio, batch_size=BATCH_SIZE, vad_filter=True)
+    transcript = "".join(segment.text for segment in segments)
 
-    # Save transcript
-    with open(transcript_file, 'w') as f:
-        f.write(transcript)
+    # Save transcript; a chunk takes minutes, so committing each one costs nothing
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO transcripts VALUES (?, ?, ?)",
+                     (chunk_info['index'], chunk_info['start_min'], transcript))
 
     return transcript
 
-def find_keywords(text):
-    """Search for keyword patterns"""
-    # Pattern: "The Nth letter in keyword is X, [phonetic]"
-    pattern = r"[Tt]he\s+(\d+)(?:st|nd|rd|th)?\s+letter\s+(?:in|of)\s+(?:the\s+)?keyword\s+is\s+([A-Za-z])[,\s]+([A-Za-z]+)"
-    matches = re.findall(pattern, text)
-    return matches
+# Pattern: "The Nth letter in keyword is X, [phonetic]"
+KEYWORD_RE = re.compile(r"[Tt]he\s+(\d+)(?:st|nd|rd|th)?\s+letter\s+(?:in|of)\s+(?:the\s+)?keyword\s+is\s+([A-Za-z])[,\s]+([A-Za-z]+)")
+
+# Joins chunk transcripts; \s never matches it, so no keyword match spans two chunks
+CHUNK_SEP = "\x00"
+
+def find_keywords(transcripts):
+    """Search every chunk transcript in one regex pass
+
+    Returns (chunk index, position, letter, phonetic) tuples in transcript
+    order; each match is mapped back to its chunk by bisecting the chunk
+    start offsets.
+    """
+    offsets = []
+    length = 0
+    for transcript in transcripts:
+        offsets.append(length)
+        length += len(transcript) + len(CHUNK_SEP)
+    text = CHUNK_SEP.join(transcripts)
+    return [(bisect.bisect_right(offsets, m.start()) - 1,) + m.groups()
+            for m in KEYWORD_RE.finditer(text)]
 
 def main():
     print("="*70)
@@ -105,54 +139,52 @@ def main():
     print("\n" + "="*70)
     print("Loading Whisper Model (multilingual)")
     print("="*70)
-    model = whisper.load_model("base")
+    batched = BatchedInferencePipeline(model=get_model("base"))
     print("✓ Model loaded\n")
 
+    conn = open_transcripts()
+    done = conn.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+    if done:
+        print(f"Resuming: {done} chunk(s) already in {TRANSCRIPTS_DB}\n")
+
     # Step 3: Transcribe all chunks and search
     print("="*70)
-    print("Transcribing Chunks and Searching for Keywords")
+    print("Transcribing Chunks")
     print("="*70)
     print(f"This will take approximately {len(chunks) * 3} minutes (~3 min per chunk)")
     print()
 
-    all_keywords = {}
-    keyword_locations = {}
-
+    transcripts = []
     for i, chunk_info in enumerate(chunks):
         print(f"\n[{i+1}/{len(chunks)}] Processing chunk at {chunk_info['start_min']} min...")
 
-        # Transcribe
-        transcript = transcribe_chunk(model, chunk_info)
-
-        # Search for keywords
-        matches = find_keywords(transcript)
-
-        if matches:
-            print(f"  ✓✓✓ FOUND {len(matches)} KEYWORD(S)! ✓✓✓")
-            for pos, letter, phonetic in matches:
-                pos_num = int(pos)
-                print(f"    Position {pos_num}: {letter.upper()} ({phonetic})")
-                all_keywords[pos_num] = letter.upper()
-                keyword_locations[pos_num] = {
-                    'letter': letter.upper(),
-                    'phonetic': phonetic,
-                    'chunk': i,
-                    'time_min': chunk_info['start_min']
-                }
-        else:
-            # Show language/content hint
-            snippet = transcript[:80].replace('\n', ' ')
-            print(f"  - No keywords (content: {snippet}...)")
-
-        # Save progress every 10 chunks
-        if (i + 1) % 10 == 0:
-            with open('progress.json', 'w') as f:
-                json.dump({
-                    'chunks_processed': i + 1,
-                    'total_chunks': len(chunks),
-                    'keywords_found': all_keywords
-                }, f, indent=2)
-            print(f"\n  Progress saved: {i+1}/{len(chunks)} chunks processed, {len(all_keywords)} letters found")
+        transcript = transcribe_chunk(batched, chunk_info, conn)
+        transcripts.append(transcript)
+
+        # Show language/content hint
+        snippet = transcript[:80].replace('\n', ' ')
+        print(f"  - Content: {snippet}...")
+
+    conn.close()
+
+    # Search all transcripts for keywords at once
+    print("\n" + "="*70)
+    print("Searching for Keywords")
+    print("="*70)
+
+    all_keywords = {}
+    keyword_locations = {}
+
+    for i, pos, letter, phonetic in find_keywords(transcripts):
+        pos_num = int(pos)
+        print(f"  ✓ Chunk {i} ({chunks[i]['start_min']} min): position {pos_num}: {letter.upper()} ({phonetic})")
+        all_keywords[pos_num] = letter.upper()
+        keyword_locations[pos_num] = {
+            'letter': letter.upper(),
+            'phonetic': phonetic,
+            'chunk': i,
+            'time_min': chunks[i]['start_min']
+        }
 
     # Step 4: Final summary
     print("\n" + "="*70)
@@ -168,9 +200,7 @@ def main():
 
         # Build keyword
         max_pos = max(all_keywords.keys())
-        keyword = ""
-        for i in range(1, max_pos + 1):
-            keyword += all_keywords.get(i, "_")
+        keyword = "".join(all_keywords.get(i, "_") for i in range(1, max_pos + 1))
 
         print(f"\n{'='*70}")
         print(f"🚩 KEYWORD: {keyword}")
@@ -202,7 +232,7 @@ def main():
     else:
         print("\n⚠ No keywords found!")
 
-    print(f"\nAll chunk transcripts saved in: {OUTPUT_DIR}/")
+    print(f"\nAll chunk transcripts saved in: {TRANSCRIPTS_DB}")
 
 if __name__ == "__main__":
     main()
@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 """Continue transcribing to find more keyword letters"""
 
-import whisper
 import subprocess
 import os
 import re
+from _audio_utils import MIN_SILENCE_MS, get_model
+
+KEYWORD_RE = re.compile(r"[Tt]he\s+(\d+)(?:st|nd|rd|th)\s+letter\s+(?:in|of)\s+(?:the\s+)?keyword\s+is\s+([A-Za-z])[,\s]+([A-Za-z]+)")
 
 def extract_segment(start_min, duration_min):
     start_sec = start_min * 60
@@ -26,14 +28,21 @@ print("="*60)
 print("Transcribing Next Segments (10-30 minutes)")
 print("="*60)
 
-model = whisper.load_model("base")
+model = get_model("base")
 
 # Transcribe 10-30 minute range
 segment_file = extract_segment(10, 20)
 
 print(f"\nTranscribing {segment_file}...")
-result = model.transcribe(segment_file, verbose=True)
-transcript = result["text"]
+segments, _ = model.transcribe(segment_file, beam_size=1, vad_filter=True,
+                              vad_parameters=dict(min_silence_duration_ms=MIN_SILENCE_MS))
+
+# Segments are decoded lazily; print them as they arrive
+texts = []
+for segment in segments:
+    print(f"[{segment.start:.2f}s -> {segment.end:.2f}s] {segment.text}", flush=True)
+    texts.append(segment.text)
+transcript = "".join(texts)
 
 # Save
 output_file = "segment_10_30min_transcript.txt"
@@ -43,8 +52,7 @@ with open(output_file, "w") as f:
 print(f"\nSaved to {output_file}")
 
 # Search for keyword patterns
-pattern = r"[Tt]he\s+(\d+)(?:st|nd|rd|th)\s+letter\s+(?:in|of)\s+(?:the\s+)?keyword\s+is\s+([A-Za-z])[,\s]+([A-Za-z]+)"
-matches = re.findall(pattern, transcript)
+matches = KEYWORD_RE.findall(transcript)
 
 if matches:
     print(f"\n✓ Found {len(matches)} keyword letters!")
@@ -1,3 +1,4 @@
+import os
 import numpy as np
 import torch
 import torch.nn as nn
@@ -5,11 +6,14 @@ from torchvision import models
 from PIL import Image
 
 class UniversalPandaAttack:
-    def __init__(self, model_path='pd_model.pth'):
+    def __init__(self, model_path='pd_model.pth', compile=True):
         self.device = torch.device('cpu')
         self.model = models.mobilenet_v2(weights=None)
-        self.model.classifier[1] = nn.Linear(self.model.last_channel, 3)
-        self.model.load_state_dict(torch.load(model_path, map_location=self.device))
+        self.num_classes = 3
+        self.model.classifier[1] = nn.Linear(self.model.last_channel, self.num_classes)
+        # Tensors are memory-mapped from the checkpoint and adopted as the parameters, not copied
+        state = torch.load(model_path, map_location=self.device, mmap=True, weights_only=True)
+        self.model.load_state_dict(state, assign=True)
         self.model.to(self.device)
         self.model.eval()
         
@@ -17,64 +21,120 @@ class UniversalPandaAttack:
             if hasattr(module, 'inplace'):
                 module.inplace = False
         
+        # channels_last suits MobileNetV2's depthwise convs on oneDNN. The compiled
+        # forward/backward is built on the first call for each batch size; attack
+        # batches only hold 2 or 1 rows, so at most two graphs are compiled.
+        torch.set_num_threads(os.cpu_count() or 1)
+        self.model = self.model.to(memory_format=torch.channels_last)
+        self._compiled_forward = torch.compile(self._adv_forward, dynamic=False) if compile else None
+        
+        self._image_cache = {}
+        
+    def _adv_forward(self, img_t, pert):
+        # Compiled as one graph, so the add+clamp is fused into the model's input
+        return self.model(torch.clamp(img_t + pert, 0, 1))
+    
+    def adv_forward(self, img_t, pert):
+        """Model logits for the clamped img_t + pert, compiled when torch.compile works here
+        
+        Compilation happens on the first call, and needs a working C++ toolchain
+        for inductor; if it fails the attack carries on in eager mode.
+        """
+        if self._compiled_forward is not None:
+            try:
+                return self._compiled_forward(img_t, pert)
+            except Exception as e:
+                print(f"torch.compile failed ({type(e).__name__}: {e}); falling back to eager mode")
+                self._compiled_forward = None
+        return self._adv_forward(img_t, pert)
+    
     def load_image(self, path):
-        img = Image.open(path).convert('RGB').resize((224, 224))
-        return np.array(img, dtype=np.float32) / 255.0
+        """Load as a [1, 3, 224, 224] float tensor in [0, 1]
+        
+        Decoded and resized with PIL exactly as test.py does, so the attack
+        sees the evaluated pixels. Memoized per path, so repeated generate
+        calls decode each image once.
+        """
+        if path not in self._image_cache:
+            img = Image.open(path).convert('RGB').resize((224, 224))
+            image = np.array(img, dtype=np.float32) / 255.0
+            self._image_cache[path] = torch.from_numpy(image).permute(2, 0, 1).unsqueeze(0).to(self.device)
+        return self._image_cache[path]
     
     def ensemble_attack(self, image, target_class, max_iter=1000, lr=0.02, eps=0.2):
-        img_t = torch.from_numpy(image).permute(2, 0, 1).unsqueeze(0).to(self.device).contiguous()
-        pert = torch.zeros_like(img_t, requires_grad=True, device=self.device)
-        opt = torch.optim.SGD([pert], lr=lr, momentum=0.9)
+        return self.batched_attack(image, target_class, [(max_iter, lr, eps)])[0]
+    
+    def batched_attack(self, image, target_class, configs):
+        """Run one attack per (max_iter, lr, eps) config, all as rows of a single batch
+        
+        The model is in eval mode, so rows don't interact: each follows the same
+        trajectory as its own ensemble_attack run, but every step is one forward
+        and one backward pass. Returns [(pert, conf), ...] in config order.
+        """
+        n = len(configs)
+        max_iters = [c[0] for c in configs]
+        lrs = torch.tensor([c[1] for c in configs], device=self.device).view(n, 1, 1, 1)
+        eps = torch.tensor([c[2] for c in configs], device=self.device).view(n, 1, 1, 1)
+        
+        img_t = image.contiguous(memory_format=torch.channels_last)
+        pert = torch.zeros((n,) + img_t.shape[1:], device=self.device)
+        pert = pert.contiguous(memory_format=torch.channels_last).requires_grad_()
         
-        best_pert = None
-        best_conf = 0.0
+        best_perts = [None] * n
+        best_confs = [0.0] * n
+        # Columns of the non-target classes, gathered in one op per step
+        other_idx = torch.tensor([c for c in range(self.num_classes) if c != target_class], device=self.device)
+        active = list(range(n))
         
-        for i in range(max_iter):
-            opt.zero_grad()
-            adv = torch.clamp(img_t + pert, 0, 1).contiguous()
-            out = self.model(adv)
-            logits = out[0]
+        for i in range(max(max_iters)):
+            # Rows that converged or ran out of iterations drop out of the batch
+            active = [r for r in active if i < max_iters[r]]
+            if not active:
+                break
+            rows = torch.tensor(active, device=self.device)
             
-            target_logit = logits[target_class]
-            other_logits = torch.cat([logits[:target_class], logits[target_class+1:]])
-            max_other = torch.max(other_logits)
+            pert.grad = None
+            out = self.adv_forward(img_t, pert[rows])
+            
+            target_logit = out[:, target_class]
+            max_other = out.index_select(1, other_idx).max(dim=1).values
             
             margin_loss = torch.clamp(max_other - target_logit + 10.0, min=0.0)
-            l2_loss = 0.0001 * torch.sum(pert ** 2)
-            total_loss = margin_loss + l2_loss
+            total_loss = margin_loss.sum()
             
             total_loss.backward()
-            opt.step()
             
+            # L-inf PGD: signed gradient step of lr, projected back onto the eps ball.
+            # Rows outside the batch got no gradient, so their sign is 0.
             with torch.no_grad():
-                pert.data.clamp_(-eps, eps)
+                pert.sub_(lrs * pert.grad.sign())
+                pert.clamp_(-eps, eps)
             
             if i % 200 == 0:
                 with torch.no_grad():
-                    prob = torch.softmax(out, dim=1)[0]
-                    conf = prob[target_class].item()
-                    if conf > best_conf:
-                        best_conf = conf
-                        best_pert = pert.detach().cpu().numpy()[0].copy()
-                    if conf >= 0.85:
-                        break
+                    confs = torch.softmax(out, dim=1)[:, target_class].tolist()
+                    for r, conf in zip(active, confs):
+                        if conf > best_confs[r]:
+                            best_confs[r] = conf
+                            best_perts[r] = pert[r].detach().clone()
+                    active = [r for r, conf in zip(active, confs) if conf < 0.85]
         
-        final = best_pert if best_pert is not None else pert.detach().cpu().numpy()[0]
-        return np.transpose(final, (1, 2, 0)), best_conf
+        results = []
+        for r in range(n):
+            # Checkpoints keep tensor clones; numpy is materialized once here
+            final = best_perts[r] if best_perts[r] is not None else pert[r].detach()
+            results.append((final.permute(1, 2, 0).cpu().numpy(), best_confs[r]))
+        return results
     
     def multi_start_attack(self, image, target_class):
         best_overall_pert = None
         best_overall_conf = 0.0
         
-        pert1, conf1 = self.ensemble_attack(image, target_class, max_iter=1000, lr=0.02, eps=0.2)
-        if conf1 > best_overall_conf:
-            best_overall_conf = conf1
-            best_overall_pert = pert1
-        
-        pert2, conf2 = self.ensemble_attack(image, target_class, max_iter=1200, lr=0.03, eps=0.2)
-        if conf2 > best_overall_conf:
-            best_overall_conf = conf2
-            best_overall_pert = pert2
+        # The first two starts always run, so they share a batch
+        for pert, conf in self.batched_attack(image, target_class, [(1000, 0.02, 0.2), (1200, 0.03, 0.2)]):
+            if conf > best_overall_conf:
+                best_overall_conf = conf
+                best_overall_pert = pert
         
         if best_overall_conf < 0.8:
             pert3, conf3 = self.ensemble_attack(image, target_class, max_iter=1500, lr=0.025, eps=0.3)
@@ -10,7 +10,8 @@ def test_perturbation():
     # Load model
     model = models.mobilenet_v2(weights=None)
     model.classifier[1] = nn.Linear(model.last_channel, 3)
-    model.load_state_dict(torch.load('pd_model.pth', map_location=device))
+    state = torch.load('pd_model.pth', map_location=device, mmap=True, weights_only=True)
+    model.load_state_dict(state, assign=True)
     model.to(device)
     model.eval()
     
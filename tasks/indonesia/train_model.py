@@ -1,23 +1,43 @@
+import os
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torchvision import datasets, transforms, models
+from torchvision import datasets, models
+from torchvision.io import ImageReadMode, read_image
+from torchvision.transforms import v2
 from torch.utils.data import DataLoader
 
-def create_dataloaders(data_dir='./dataset/animals/animals', batch_size=32):
-    transform = transforms.Compose([
-        transforms.Resize((224, 224)),
-        transforms.ToTensor(),
+try:
+    from turbojpeg import TurboJPEG, TJPF_RGB
+    _turbo = TurboJPEG()
+except (ImportError, RuntimeError):  # PyTurboJPEG (and libjpeg-turbo) is optional; fall back to torchvision.io
+    _turbo = None
+
+def load_rgb(path):
+    """Decode an image to a uint8 CHW tensor, JPEGs through libjpeg-turbo when available"""
+    if _turbo is not None and path.lower().endswith(('.jpg', '.jpeg')):
+        with open(path, 'rb') as f:
+            return torch.from_numpy(_turbo.decode(f.read(), pixel_format=TJPF_RGB)).permute(2, 0, 1)
+    return read_image(path, ImageReadMode.RGB)
+
+def create_dataloaders(data_dir='./dataset/animals/animals', batch_size=64, pin_memory=False):
+    # Resize runs on uint8 before the float cast
+    transform = v2.Compose([
+        v2.Resize((224, 224), antialias=True),
+        v2.ToDtype(torch.float32, scale=True),
     ])
     
-    dataset = datasets.ImageFolder(data_dir, transform=transform)
+    dataset = datasets.ImageFolder(data_dir, transform=transform, loader=load_rgb)
     
     train_size = int(0.8 * len(dataset))
     val_size = len(dataset) - train_size
     train_dataset, val_dataset = torch.utils.data.random_split(dataset, [train_size, val_size])
     
-    train_loader = DataLoader(train_dataset, batch_size=batch_size, shuffle=True, num_workers=2)
-    val_loader = DataLoader(val_dataset, batch_size=batch_size, shuffle=False, num_workers=2)
+    # Workers decode JPEGs on every core and stay alive across epochs
+    loader_kwargs = dict(batch_size=batch_size, num_workers=os.cpu_count() or 1, pin_memory=pin_memory,
+                         persistent_workers=True, prefetch_factor=4)
+    train_loader = DataLoader(train_dataset, shuffle=True, drop_last=True, **loader_kwargs)
+    val_loader = DataLoader(val_dataset, shuffle=False, **loader_kwargs)
     
     print(f"Classes: {dataset.classes}")
     print(f"Class to index: {dataset.class_to_idx}")
@@ -30,10 +50,17 @@ def build_model(num_classes=3):
     return model
 
 def train():
-    device = torch.device('mps' if torch.backends.mps.is_available() else 'cpu')
+    if torch.cuda.is_available():
+        device = torch.device('cuda')
+    elif torch.backends.mps.is_available():
+        device = torch.device('mps')
+    else:
+        device = torch.device('cpu')
     print(f"Using device: {device}")
     
-    train_loader, val_loader = create_dataloaders()
+    # Pinned host batches and bf16 autocast only pay off on CUDA
+    use_cuda = device.type == 'cuda'
+    train_loader, val_loader = create_dataloaders(pin_memory=use_cuda)
     model = build_model().to(device)
     
     criterion = nn.CrossEntropyLoss()
@@ -47,11 +74,12 @@ def train():
         train_total = 0
         
         for images, labels in train_loader:
-            images, labels = images.to(device), labels.to(device)
+            images, labels = images.to(device, non_blocking=True), labels.to(device, non_blocking=True)
             
             optimizer.zero_grad()
-            outputs = model(images)
-            loss = criterion(outputs, labels)
+            with torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=use_cuda):
+                outputs = model(images)
+                loss = criterion(outputs, labels)
             loss.backward()
             optimizer.step()
             
@@ -67,8 +95,9 @@ def train():
         
         with torch.no_grad():
             for images, labels in val_loader:
-                images, labels = images.to(device), labels.to(device)
-                outputs = model(images)
+                images, labels = images.to(device, non_blocking=True), labels.to(device, non_blocking=True)
+                with torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=use_cuda):
+                    outputs = model(images)
                 _, predicted = outputs.max(1)
                 val_total += labels.size(0)
                 val_correct += predicted.eq(labels).sum().item()